@@ -1,2 +1,2 @@
 @echo off
-pytest --import-mode=importlib -n 16 %*
\ No newline at end of file
+pytest --import-mode=importlib -n 16 --dist loadgroup %*
\ No newline at end of file
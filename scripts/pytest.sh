@@ -1,2 +1,2 @@
 #!/bin/bash
-pytest --import-mode=importlib -n 16 "$@"
+pytest --import-mode=importlib -n 16 --dist loadgroup "$@"
@@ -61,9 +61,20 @@ try:
         return weather_data.get(city, f"{city}的天气信息暂时无法获取")
     
     if __name__ == "__main__":
-        print("启动演示MCP服务器...")
+        import argparse
+
+        parser = argparse.ArgumentParser(description="演示MCP服务器")
+        parser.add_argument("--http", action="store_true", help="使用streamable-http传输（默认STDIO）")
+        parser.add_argument("--host", default="127.0.0.1", help="HTTP服务器主机")
+        parser.add_argument("--port", type=int, default=8000, help="HTTP服务器端口")
+        args = parser.parse_args()
+
         # 运行服务器
-        server.run()
+        if args.http:
+            server.run(transport="streamable-http", host=args.host, port=args.port, path="/")
+        else:
+            print("启动演示MCP服务器...")
+            server.run()
 
 except ImportError:
     print("fastmcp 库未安装，无法运行演示服务器")
@@ -1,9 +1,17 @@
 import json
+import re
 from typing import List, Any, Type
 from pydantic import BaseModel, ValidationError
 import os
 import sys
-from .template_parser import TemplateParser, MyModel, strip_think_tags
+from .template_parser import TemplateParser, MyModel, LRUCache, strip_think_tags
+
+# value_only 模式下的行匹配与字段切分（字段值中的逗号需在引号内）
+_ROW_RE = re.compile(r"\{([^{}]+)\}")
+_ITEM_RE = re.compile(r'"[^"]*"|\'[^\']*\'|[^,]+')
+_VALUE_CONVERTERS = {int: int, float: float}
+# validate 结果缓存条数（重试时常把同一输出再次传入）
+_VALIDATE_CACHE_SIZE = 64
 
 
 # 每行数据结构，支持int, str ,float等类型
@@ -35,69 +43,118 @@ class TableParser:
             elif isinstance(field_type, type) and issubclass(field_type, BaseModel):
                 model_map[field_type.__name__] = field_type
         self.parser = TemplateParser(self.template, model_map=model_map)
+        # 行字段顺序固定，保存为 tuple 供解析和各格式输出复用
+        self._headers = tuple(self.row_model.model_fields.keys()) if self.row_model else ()
+        # 每个字段的值转换函数，值本身均为 str，非 int/float 字段原样保留
+        self._converters = tuple(
+            _VALUE_CONVERTERS.get(self.row_model.model_fields[h].annotation, str) for h in self._headers
+        )
+        self._empty_json = json.dumps({self.table_field: []}, ensure_ascii=False)
+        self._validate_cache = LRUCache(_VALIDATE_CACHE_SIZE)
+        # value_only 的格式说明只依赖行模型，构造时生成一次即可
+        self._format_instructions = self._build_value_only_instructions() if value_only else None
 
     def validate(self, llm_output: str):
+        # 返回缓存结果的副本，调用方增删行或修改行字段不会影响之后的结果
+        return self._copy_result(self._cached_validate(llm_output))
+
+    def _cached_validate(self, llm_output: str):
+        # 成功和失败的结果都缓存，按最近使用淘汰；返回的对象与缓存共享，只能读取
+        result = self._validate_cache.get(llm_output)
+        if result is None:
+            result = self._validate(llm_output)
+            self._validate_cache.put(llm_output, result)
+        return result
+
+    def _copy_result(self, result):
+        """复制到每行的字典为止（与行数成正比，远低于深拷贝），行内嵌套的值仍与缓存共享"""
+        if not result["success"]:
+            return dict(result)
+        table = dict(result["data"]["table"])
+        rows = table.get(self.table_field)
+        if rows is not None:
+            table[self.table_field] = [dict(row) for row in rows]
+        return {**result, "data": {**result["data"], "table": table}}
+
+    def _validate(self, llm_output: str):
         llm_output = strip_think_tags(llm_output)
         if self.value_only:
-            llm_output_1 = {self.table_field: self._parse_value_only(llm_output)}
-            llm_output_json = json.dumps(llm_output_1, ensure_ascii=False)
-            return self.parser.validate(llm_output_json)
+            # 行数据已是 Python 对象，直接交给 pydantic 校验，避免 json.dumps 后再解析
+            rows = self._parse_value_only(llm_output)
+            try:
+                table = self.table_model.model_validate({self.table_field: rows})
+            except ValidationError as e:
+                return {
+                    "success": False,
+                    "data": str(e),
+                    "matched_output": llm_output
+                }
+            return {
+                "success": True,
+                "data": {"table": table.model_dump()},
+                "matched_output": llm_output
+            }
         else:
             return self.parser.validate(llm_output)
 
     def get_format_instructions(self) -> str:
         if self.value_only:
-            headers = list(self.row_model.model_fields.keys())
-            example_row = ",".join([f'"{h}值(替换为具体数值)"' if self.row_model.model_fields[h].annotation == str else "1" for h in headers])
-            instructions = (
-                "请按如下格式输出，仅包含字段值（value），不需要字段名（key）：\n"
-                "每一行用大括号包裹，字段顺序严格为：" + ",".join(headers) + "\n"
-                "每个字段值之间用英文逗号分隔，字符串请用英文双引号括起来，数字直接填写。\n"
-                "例如：\n"
-                "{ " + example_row + " }\n"
-                "如果有多行，可以用逗号分隔所有大括号，或放在一个列表中，如：\n"
-                "{ [" + "{ " + example_row + " }, { " + example_row + " }] }\n"
-                "注意：不要返回字段名，只返回字段值，字段顺序必须与上面一致。\n"
-                "每一行字段值的数据类型约束如下（仅参考类型约束，不要返回字段名）：\n"
-            )
-            # 构建 json_schemas 字典
-            json_schemas = {}
-            json_schemas[self.row_model.__name__] = self.row_model.model_json_schema()
-            for name, schema in json_schemas.items():
-                instructions += f"\n{json.dumps(schema, ensure_ascii=False, indent=2)}\n"
-            return instructions
+            return self._format_instructions
         else:
             return self.parser.get_format_instructions()
 
+    def _build_value_only_instructions(self) -> str:
+        headers = self._headers
+        example_row = ",".join([f'"{h}值(替换为具体数值)"' if self.row_model.model_fields[h].annotation == str else "1" for h in headers])
+        instructions = (
+            "请按如下格式输出，仅包含字段值（value），不需要字段名（key）：\n"
+            "每一行用大括号包裹，字段顺序严格为：" + ",".join(headers) + "\n"
+            "每个字段值之间用英文逗号分隔，字符串请用英文双引号括起来，数字直接填写。\n"
+            "例如：\n"
+            "{ " + example_row + " }\n"
+            "如果有多行，可以用逗号分隔所有大括号，或放在一个列表中，如：\n"
+            "{ [" + "{ " + example_row + " }, { " + example_row + " }] }\n"
+            "注意：不要返回字段名，只返回字段值，字段顺序必须与上面一致。\n"
+            "每一行字段值的数据类型约束如下（仅参考类型约束，不要返回字段名）：\n"
+        )
+        schema = self.row_model.model_json_schema()
+        instructions += f"\n{json.dumps(schema, ensure_ascii=False, indent=2)}\n"
+        return instructions
+
     def get_rows(self, llm_output: str):
         result = self.validate(llm_output)
         if not result["success"]:
             return []
         return result["data"]["table"][self.table_field]
 
+    def _resolve_rows(self, llm_output) -> list:
+        if isinstance(llm_output, list):
+            return llm_output
+        # 各格式输出只读取行数据，直接使用缓存的解析结果，同一输出转换为多种格式时只解析一次
+        result = self._cached_validate(llm_output)
+        if not result["success"]:
+            return []
+        return result["data"]["table"][self.table_field]
+
     def _parse_value_only(self, llm_output: str) -> list:
-        import re
-        matches = re.findall(r"\{([^{}]+)\}", llm_output)
-        headers = list(self.row_model.model_fields.keys())
+        # 没有任何大括号时不可能有行数据，跳过正则扫描
+        if "{" not in llm_output:
+            return []
+        matches = _ROW_RE.findall(llm_output)
+        headers = self._headers
+        converters = self._converters
         rows = []
         for m in matches:
             # 支持逗号在引号内的字段
-            items = re.findall(r'"[^"]*"|\'[^\']*\'|[^,]+', m)
-            items = [x.strip().strip('"').strip("'") for x in items]
+            items = _ITEM_RE.findall(m)
+            items = [x.strip().strip("\"'") for x in items]
+            # 字段数多于表头且末尾为空时，视为行尾多余的逗号
             if len(items) > len(headers) and items[-1] == "":
                 items = items[:-1]
             if len(items) != len(headers):
                 continue
-            row = {}
             try:
-                for h, v in zip(headers, items):
-                    typ = self.row_model.model_fields[h].annotation
-                    if typ == int:
-                        v = int(v)
-                    elif typ == float:
-                        v = float(v)
-                    row[h] = v
-                rows.append(row)
+                rows.append({h: conv(v) for h, conv, v in zip(headers, converters, items)})
             except Exception as e:
                 if self.skip_on_type_error:
                     continue
@@ -106,59 +163,80 @@ class TableParser:
         return rows
 
     def to_tsv(self, llm_output) -> str:
-        if isinstance(llm_output, list):
-            rows = llm_output
-        else:
-            rows = self.get_rows(llm_output)
+        rows = self._resolve_rows(llm_output)
         if not rows:
             return ""
-        headers = list(self.row_model.model_fields.keys())
-        lines = ["\t".join(headers)]
-        for row in rows:
-            line = "\t".join(str(row[h]) for h in headers)
-            lines.append(line)
-        return "\n".join(lines)
+        return self._tsv_from(self._cells(self._values(rows)))
 
     def to_csv(self, llm_output) -> str:
-        import csv
-        from io import StringIO
-        if isinstance(llm_output, list):
-            rows = llm_output
-        else:
-            rows = self.get_rows(llm_output)
+        rows = self._resolve_rows(llm_output)
         if not rows:
             return ""
-        headers = list(self.row_model.model_fields.keys())
-        output = StringIO()
-        writer = csv.DictWriter(output, fieldnames=headers)
-        writer.writeheader()
-        for row in rows:
-            writer.writerow({h: row[h] for h in headers})
-        return output.getvalue().strip()
+        return self._csv_from(self._values(rows))
 
     def to_markdown(self, llm_output) -> str:
-        if isinstance(llm_output, list):
-            rows = llm_output
-        else:
-            rows = self.get_rows(llm_output)
+        rows = self._resolve_rows(llm_output)
         if not rows:
             return ""
-        headers = list(self.row_model.model_fields.keys())
-        md = "| " + " | ".join(headers) + " |\n"
-        md += "| " + " | ".join(["---"] * len(headers)) + " |\n"
-        for row in rows:
-            md += "| " + " | ".join(str(row[h]) for h in headers) + " |\n"
-        return md.strip()
+        return self._markdown_from(self._cells(self._values(rows)))
 
     def to_json(self, llm_output) -> str:
-        if isinstance(llm_output, list):
-            rows = llm_output
-        else:
-            rows = self.get_rows(llm_output)
+        rows = self._resolve_rows(llm_output)
         if not rows:
-            return json.dumps({self.table_field: []}, ensure_ascii=False)
+            return self._empty_json
         return json.dumps({self.table_field: rows}, ensure_ascii=False)
 
+    def to_formats(self, llm_output) -> dict:
+        """
+        一次遍历行数据同时生成 tsv/csv/markdown/json 四种格式，
+        结果与分别调用 to_tsv/to_csv/to_markdown/to_json 相同
+        """
+        rows = self._resolve_rows(llm_output)
+        if not rows:
+            return {"tsv": "", "csv": "", "markdown": "", "json": self._empty_json}
+        values = self._values(rows)
+        cells = self._cells(values)
+        return {
+            "tsv": self._tsv_from(cells),
+            "csv": self._csv_from(values),
+            "markdown": self._markdown_from(cells),
+            "json": json.dumps({self.table_field: rows}, ensure_ascii=False),
+        }
+
+    def _values(self, rows) -> list:
+        # 按固定表头顺序取出每行的值，各格式共用
+        headers = self._headers
+        return [[row[h] for h in headers] for row in rows]
+
+    @staticmethod
+    def _cells(values) -> list:
+        return [[str(v) for v in vals] for vals in values]
+
+    def _tsv_from(self, cells) -> str:
+        lines = ["\t".join(self._headers)]
+        # str.join 对 list 参数可预知长度，比生成器少一次中间转换
+        lines.extend(["\t".join(c) for c in cells])
+        return "\n".join(lines)
+
+    def _csv_from(self, values) -> str:
+        import csv
+        from io import StringIO
+        output = StringIO()
+        writer = csv.writer(output)
+        writer.writerow(self._headers)
+        # csv 需要原始值（如 None 写为空串），不能复用字符串化后的单元格
+        writer.writerows(values)
+        return output.getvalue().strip()
+
+    def _markdown_from(self, cells) -> str:
+        headers = self._headers
+        lines = [
+            "| " + " | ".join(headers) + " |",
+            "| " + " | ".join(["---"] * len(headers)) + " |",
+        ]
+        lines.extend(["| " + " | ".join(c) + " |" for c in cells])
+        return "\n".join(lines).strip()
+
 
 def test_table_parser():
     # llm_output = 'json```{"rows": [{"foo": "A", "num": 1}, {"foo": "B", "num": 2}]}```'
@@ -1,10 +1,42 @@
+import ast
 import datetime
+import functools
 import re
 import json
+import os
+import threading
+import types
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Any, get_origin, get_args
-from pydantic import create_model, ValidationError, constr, BaseModel
+from typing_extensions import TypedDict
+from pydantic import create_model, ValidationError, constr, BaseModel, TypeAdapter
 from pydantic.json_schema import JsonSchemaValue
-from jsonschema import validate as jsonschema_validate, ValidationError as JsonSchemaError
+from pydantic_core import SchemaValidator, core_schema
+
+# numpy 用于长文本的括号配对，未安装时只用逐字符计数
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# orjson 为可选依赖，用于 JSON 字段（如工具调用参数）的解析，未安装时使用标准库 json。
+# json_loads 也供 tool_call 等模块直接解码 JSON 使用
+try:
+    import orjson
+
+    def json_loads(text):
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            # orjson 不接受 NaN/Infinity 和超出 64 位的整数，交给标准库兜底
+            return json.loads(text)
+except ImportError:
+    json_loads = json.loads
+
+_THINK_BLOCK_RE = re.compile(r'(?is)<think>.*?</think>')
+_THINK_TAG_RE = re.compile(r'(?i)</?think\s*/?>')
+
 
 def strip_think_tags(text: str) -> str:
     """
@@ -13,10 +45,13 @@ def strip_think_tags(text: str) -> str:
     """
     if not text:
         return text
-    # 删除成对的 <think>...</think>（非贪婪、跨行）
-    cleaned = re.sub(r'(?is)<think>.*?</think>', '', text)
-    # 删除任何残留的孤立 think 标签
-    cleaned = re.sub(r'(?i)</?think\s*/?>', '', cleaned)
+    cleaned = text
+    # think 标签必然包含 '<'，绝大多数输出不含它时可跳过两次正则替换
+    if "<" in text:
+        # 删除成对的 <think>...</think>（非贪婪、跨行）
+        cleaned = _THINK_BLOCK_RE.sub('', cleaned)
+        # 删除任何残留的孤立 think 标签
+        cleaned = _THINK_TAG_RE.sub('', cleaned)
     # 去除前后及多余空白行
     return "\n".join(line for line in (l.rstrip() for l in cleaned.splitlines()) if line).strip()
 
@@ -42,9 +77,29 @@ def _schema_to_example(schema: dict, model_cls: type = None):
                 return sch
         return node
 
+    # 同一次调用内按 schema 节点 id 记忆结果，共享的 $defs 只展开一次
+    memo = {}
+    # 正在展开的节点，用于打断自引用（递归模型）的无限展开
+    in_progress = set()
+
     def _inner(sch, root):
         if not isinstance(sch, dict):
             return None
+        key = id(sch)
+        if key in memo:
+            return memo[key]
+        if key in in_progress:
+            # 递归引用自身，返回 None 交由上层按类型兜底
+            return None
+        in_progress.add(key)
+        try:
+            result = _compute(sch, root)
+        finally:
+            in_progress.discard(key)
+        memo[key] = result
+        return result
+
+    def _compute(sch, root):
         # 优先 examples / default
         if "examples" in sch and sch["examples"]:
             return sch["examples"][0]
@@ -218,21 +273,432 @@ def _schema_to_example(schema: dict, model_cls: type = None):
             return None
     return example
 
+# memoize=True 时缓存的 validate 结果条数
+_MEMO_SIZE = 128
+
+
+class LRUCache:
+    """按最近使用淘汰的结果缓存，TemplateParser 的 memo 和 TableParser 的 validate 缓存共用。"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def get(self, key):
+        value = self._data.get(key)
+        if value is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._data[key] = value
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+def _copy_result(result):
+    """复制 validate 结果及其 data 字典（与字段数成正比），字段值内部的嵌套对象仍与缓存共享。"""
+    data = result["data"]
+    return {**result, "data": dict(data) if isinstance(data, dict) else data}
+
+# 列表类型的泛型别名只构造一次，判断时直接查表
+_LIST_STR = List[str]
+_LIST_INT = List[int]
+_LIST_TYPES = frozenset({_LIST_STR, _LIST_INT})
+
+# 字段类型到解析方式的映射；BaseModel 子类单独判断，其余类型按 str 处理
+_FIELD_KINDS = {
+    int: "int",
+    float: "float",
+    bool: "bool",
+    _LIST_STR: "list",
+    _LIST_INT: "list",
+    dict: "json",
+    Any: "json",
+}
+
+# 格式说明中各类型变量的示例值
+_EXAMPLE_VALUES = {
+    "int": "42",
+    "float": "3.14",
+    "str": "示例内容",
+    "bool": "true",
+    "list[str]": "[\"A\", \"B\"]",
+    "list[int]": "[1, 2]",
+    "dict": "{\"key\": \"value\"}",
+    "json": "{\"foo\": \"bar\", \"num\": 1}",
+    "any": "{\"foo\": \"bar\"}"
+}
+# 常用字段类型直接查表得到示例值，不再逐个做 typing 判断
+_TYPE_EXAMPLES = {
+    int: _EXAMPLE_VALUES["int"],
+    float: _EXAMPLE_VALUES["float"],
+    str: _EXAMPLE_VALUES["str"],
+    bool: _EXAMPLE_VALUES["bool"],
+    _LIST_STR: _EXAMPLE_VALUES["list[str]"],
+    _LIST_INT: _EXAMPLE_VALUES["list[int]"],
+    list: "[...]",
+    dict: _EXAMPLE_VALUES["dict"],
+    Any: _EXAMPLE_VALUES["json"],
+}
+
+# 不同模板解析状态的缓存条数
+_BUILD_CACHE_SIZE = 256
+_BUILD_LOCK = threading.Lock()
+
+# validate_many 批量不足该条数时串行校验，进程池的启动开销不划算
+_PARALLEL_MIN_BATCH = 64
+
+# 输出不超过该长度时优先用整体正则匹配；字段值较长时逐字符的惰性匹配反而比 str.find 慢
+_COMBINED_MAX_LEN = 128
+
+# 模板变量定义，如 {name:str}、{code:str:regex=...}、{data:json:ModelName}
+_FIELD_RE = re.compile(r"\{(\w+):(\w+(\[[^\]]+\])?)(:regex=([^\}:]+))?(?::(\w+))?\}")
+
+
+# seg_start 为空时，按字段类型定位值的起始位置；定位函数返回起始下标，未找到返回 -1
+def _regex_locator(pattern):
+    search = pattern.search
+
+    def locate(text, idx):
+        m = search(text, idx)
+        return m.start() if m else -1
+    return locate
+
+
+def _locate_list(text, idx):
+    """返回同一行内存在闭合 ']' 的第一个 '[' 的位置（与原先的非贪婪列表正则一致）。"""
+    pos = text.find("[", idx)
+    while pos != -1:
+        close = text.find("]", pos)
+        if close == -1:
+            return -1
+        newline = text.find("\n", pos, close)
+        if newline == -1:
+            return pos
+        pos = text.find("[", newline)
+    return -1
+
+
+def _locate_json(text, idx):
+    """返回之后还存在 '}' 的第一个 '{' 的位置（与原先的跨行 JSON 正则一致）。"""
+    pos = text.find("{", idx)
+    if pos != -1 and text.find("}", pos) == -1:
+        return -1
+    return pos
+
+
+_LOCATORS = {
+    "int": _regex_locator(re.compile(r"\d+")),
+    "float": _regex_locator(re.compile(r"\d+(\.\d+)?")),
+    "bool": _regex_locator(re.compile(r"(true|false|True|False|1|0)")),
+    "list": _locate_list,
+    "json": _locate_json,
+}
+_LOCATE_LABELS = {"int": "整数值", "float": "浮点值", "bool": "布尔值", "list": "列表值", "json": "JSON/dict 值"}
+
+# seg_end 为空（字段位于模板末尾）时，按字段类型识别值的结尾
+_TAIL_RES = {
+    "int": re.compile(r"\d+"),
+    "float": re.compile(r"\d+(\.\d+)?"),
+    "bool": re.compile(r"true|false|True|False|1|0"),
+    "list": re.compile(r"\[.*?\]"),
+}
+_TAIL_LABELS = {"int": "整数", "float": "浮点数", "list": "列表"}
+
+# 需要做括号配对的字段类型
+_BRACKETS = {"json": ("{", "}"), "list": ("[", "]")}
+
+
+# 剩余文本不少于该长度、且平均每 _NUMPY_BRACKET_SPACING 个字符就有一个开括号时，
+# 用 numpy 做括号配对；括号稀疏时按 str.find 跳转更快
+_NUMPY_MIN_LEN = 256
+_NUMPY_BRACKET_SPACING = 16
+
+
+def _match_bracket_np(text: str, open_c: str, close_c: str, start: int = 0):
+    """_match_bracket 的向量化实现：按码点标记 +1/-1，累加后找第一个深度为 0 的位置。"""
+    # UTF-32 编码后每个码点对应一个元素，下标与 str 下标一致
+    codes = np.frombuffer(text[start:].encode("utf-32-le"), dtype=np.uint32)
+    depth = np.cumsum((codes == ord(open_c)).astype(np.int32) - (codes == ord(close_c)))
+    closed = np.flatnonzero(depth == 0)
+    if len(closed) == 0:
+        return None
+    return start + int(closed[0]) + 1
+
+
+def _match_bracket(text: str, open_c: str, close_c: str, start: int = 0):
+    """text[start] 为 open_c，返回与之配对的 close_c 之后的位置；未闭合时返回 None。"""
+    remaining = len(text) - start
+    if (np is not None and remaining >= _NUMPY_MIN_LEN
+            and text.count(open_c, start) * _NUMPY_BRACKET_SPACING >= remaining):
+        return _match_bracket_np(text, open_c, close_c, start)
+    # 用 str.find 直接跳到下一个括号，不逐字符遍历
+    depth = 0
+    next_open = text.find(open_c, start)
+    pos = start
+    while True:
+        next_close = text.find(close_c, pos)
+        if next_close == -1:
+            return None
+        while next_open != -1 and next_open < next_close:
+            depth += 1
+            next_open = text.find(open_c, next_open + 1)
+        depth -= 1
+        pos = next_close + 1
+        if depth == 0:
+            return pos
+
+
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _scan_bracket(text: str, open_c: str, close_c: str, start: int = 0):
+    """text[start] 为 open_c，返回 (结束位置, 解析结果)，位置相对整个 text。
+
+    优先用 JSONDecoder.raw_decode 在 C 层一次完成定位和解析；
+    不是合法 JSON（如 Python 字面量）时退回括号计数，解析结果为 None。
+    """
+    try:
+        obj, end = _JSON_DECODER.raw_decode(text, start)
+        return end, obj
+    except ValueError:
+        return _match_bracket(text, open_c, close_c, start), None
+
+
+def _is_model_type(typ):
+    """typ 是否为 BaseModel 子类（constr、List[str] 等不是类，需先排除）。"""
+    return isinstance(typ, type) and issubclass(typ, BaseModel)
+
+
+# 提取字段值：根据字段类型和结尾分割符预先生成 take(text, idx) -> (value, 结束位置)，
+# 直接在整个输出上按 idx 查找，避免每个字段都切出剩余字符串
+
+def _value_taker(name, kind, seg_end, keep_text=False):
+    """keep_text 为 True 时 JSON 值只定位不解析，返回原文（交给 model_validate_json 解析）。"""
+    bracket = _BRACKETS.get(kind)
+    if seg_end:
+        return _take_until(seg_end, bracket, keep_text)
+    if kind in _TAIL_RES:
+        return _take_tail_match(name, kind)
+    if kind == "json":
+        return _take_tail_json(name, keep_text)
+    return _take_rest
+
+
+def _take_until(seg_end, bracket, keep_text=False):
+    open_c = bracket[0] if bracket else None
+
+    def take(text, idx):
+        # 优先处理复杂类型，提取完整的 JSON/列表值；没有闭合时退回分割符处理
+        if open_c is not None and text.startswith(open_c, idx):
+            end, obj = _scan_bracket(text, *bracket, idx)
+            if end is not None:
+                return (text[idx:end].strip() if obj is None or keep_text else obj), end
+        next_pos = text.find(seg_end, idx)
+        if next_pos == -1:
+            raise ValueError(f"输出格式错误，缺少 '{seg_end}'")
+        return text[idx:next_pos].strip(), next_pos
+    return take
+
+
+def _take_tail_match(name, kind):
+    # 自动识别类型结尾
+    pattern = _TAIL_RES[kind]
+
+    def take(text, idx):
+        m = pattern.match(text, idx)
+        if m:
+            return m.group(0), m.end()
+        if kind == "bool":
+            return text[idx:].strip(), len(text)
+        raise ValueError(f"结尾字段 {name} 不是合法{_TAIL_LABELS[kind]}")
+    return take
+
+
+def _take_tail_json(name, keep_text=False):
+    def take(text, idx):
+        if not text.startswith("{", idx):
+            raise ValueError(f"结尾字段 {name} 不是合法 JSON")
+        end, obj = _scan_bracket(text, "{", "}", idx)
+        if end is None:
+            # 没有闭合
+            return text[idx:].strip(), len(text)
+        return (text[idx:end] if obj is None or keep_text else obj), end
+    return take
+
+
+def _take_rest(text, idx):
+    # 默认取剩余内容
+    return text[idx:].strip(), len(text)
+
+
+def _to_bool(val):
+    if isinstance(val, str):
+        if val.lower() in ("true", "1"):
+            return True
+        elif val.lower() in ("false", "0"):
+            return False
+    return val
+
+
+def _json_or_literal(val):
+    """列表/字典字段：优先按 JSON 解析（C 实现），失败再按 Python 字面量（如单引号）解析。"""
+    if not isinstance(val, str):
+        # 提取阶段已解析过
+        return val
+    try:
+        return json_loads(val)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(val)
+    except Exception:
+        return val
+
+
+def _json_or_raw(val):
+    if not isinstance(val, str):
+        return val
+    try:
+        return json_loads(val)
+    except Exception:
+        return val
+
+
+@functools.lru_cache(maxsize=None)
+def _schema_for(model_cls) -> JsonSchemaValue:
+    """每个 BaseModel 的 json schema 只生成一次，示例和格式说明共用（只读，不要修改）。"""
+    return model_cls.model_json_schema()
+
+
+def _model_converter(name, model_cls, strict=True):
+    """BaseModel 字段：用 model_validate_json 一次完成 JSON 解析和校验。
+
+    strict 时按 pydantic 的 JSON 严格模式校验（如 "1" 不能作为 int），与按 json schema 校验的效果一致。
+    """
+    model_validate_json = model_cls.model_validate_json
+
+    def convert(val):
+        try:
+            return model_validate_json(val, strict=strict)
+        except Exception as e:
+            raise ValueError(f"字段 {name} 不符合 schema: {e}")
+    return convert
+
+
+@functools.lru_cache(maxsize=None)
+def _example_json_for_model(model_cls) -> str:
+    """格式说明中 BaseModel 变量的示例 JSON，每个模型只生成一次。"""
+    # 使用全局的 schema -> example 生成更准确的示例值
+    try:
+        example_obj = _schema_to_example(_schema_for(model_cls), model_cls)
+        if example_obj is not None:
+            return json.dumps(example_obj, ensure_ascii=False)
+    except Exception:
+        pass
+    value_dict = {f: f"示例值" for f in model_cls.model_fields}
+    return json.dumps(value_dict, ensure_ascii=False)
+
+
+@functools.lru_cache(maxsize=None)
+def _schema_json_for_model(model_cls) -> str:
+    return json.dumps(_schema_for(model_cls), ensure_ascii=False)
+
+
+# 常用字段类型对应的 pydantic-core schema
+_CORE_SCHEMAS = {
+    int: core_schema.int_schema,
+    float: core_schema.float_schema,
+    str: core_schema.str_schema,
+    bool: core_schema.bool_schema,
+    _LIST_STR: lambda: core_schema.list_schema(core_schema.str_schema()),
+    _LIST_INT: lambda: core_schema.list_schema(core_schema.int_schema()),
+    dict: core_schema.dict_schema,
+    Any: core_schema.any_schema,
+}
+
+
+def _build_validator(fields):
+    """字段校验器：与 DynamicModel 等价的 TypedDict 校验，直接得到 dict，省去模型实例化和 model_dump。
+
+    字段都是常用类型时直接构建 core schema 交给 SchemaValidator，省去 TypeAdapter 的类型分析；
+    含 BaseModel、constr 等类型时仍用 TypeAdapter 生成 schema。
+    """
+    if all(field[0] in _CORE_SCHEMAS for field in fields.values()):
+        schema = core_schema.typed_dict_schema(
+            {name: core_schema.typed_dict_field(_CORE_SCHEMAS[field[0]]()) for name, field in fields.items()},
+            cls_name='DynamicModel',
+        )
+        return SchemaValidator(schema)
+    return TypeAdapter(TypedDict('DynamicModel', {name: field[0] for name, field in fields.items()}))
+
+
+@functools.lru_cache(maxsize=None)
+def _dynamic_model_for(template, model_items):
+    fields, _ = TemplateParser.parse_template(template, dict(model_items))
+    return create_model('DynamicModel', **fields)
+
+
 # 示例 pydantic 子模型
 class MyModel(BaseModel):
     foo: str
     num: str
 
 class TemplateParser:
-    def __init__(self, template, model_map=None):
+    def __init__(self, template, model_map=None, strict=True, memoize=False):
+        """
+        strict: json 类型变量是否按 schema 严格校验（如 "1" 不能作为 int）；
+                为 False 时按 pydantic 默认的宽松模式校验（允许 "1" 转换为 int 等）。
+        memoize: 是否缓存最近 validate 过的输出及结果，重复校验同一输出时直接返回缓存结果。
+                 返回值只复制外层结果和 data 字典，JSON/列表等字段值与缓存共享，不要原地修改。
+        """
         self.template = template
         self.model_map = model_map or {}
-        self.fields, self.segments = self.parse_template(template, model_map)
-        self.DynamicModel = create_model('DynamicModel', **self.fields)
+        self.strict = strict
+        self._memo = LRUCache(_MEMO_SIZE) if memoize else None
+        (self.fields, self.segments, self._plan, self._conversions, self._coercions, self._combined_re,
+         self._start_re, self._adapter, self._dump_models) = self._parser_state(template, self.model_map, strict)
+
+    @property
+    def DynamicModel(self):
+        """模板对应的 pydantic 模型。校验不依赖它，只在用到时才创建（create_model 开销较大）。"""
+        model_items = tuple(sorted(self.model_map.items(), key=lambda x: x[0]))
+        return _dynamic_model_for(self.template, model_items)
+
+    @classmethod
+    def precompile(cls, templates, model_map=None, strict=True):
+        """预先构建一批模板的解析状态，之后创建这些模板的 TemplateParser 时直接复用。"""
+        for template in templates:
+            cls._parser_state(template, model_map or {}, strict)
+
+    @classmethod
+    def _parser_state(cls, template, model_map, strict):
+        model_items = tuple(sorted(model_map.items(), key=lambda x: x[0]))
+        # 加锁避免多个线程同时为同一模板重复构建
+        with _BUILD_LOCK:
+            return cls._build_parser_state(template, model_items, strict)
+
+    @classmethod
+    @functools.lru_cache(maxsize=_BUILD_CACHE_SIZE)
+    def _build_parser_state(cls, template, model_items, strict):
+        """相同模板（及 model_map、strict）的解析结果、校验器和解析计划在实例间共享。"""
+        fields, segments = cls.parse_template(template, dict(model_items))
+        plan, conversions, coercions = cls._build_plan(fields, segments, strict)
+        combined_re = cls._build_combined_re(fields, segments)
+        # 模板起始标识的查找模式只编译一次
+        start_re = re.compile(re.escape(segments[0])) if segments[0] else None
+        adapter = _build_validator(fields)
+        dump_models = any(_is_model_type(field[0]) for field in fields.values())
+        # 解析状态在同一模板的所有实例间共享，fields/segments 以只读形式交出，避免一处修改影响其他解析器
+        fields, segments = types.MappingProxyType(fields), tuple(segments)
+        return fields, segments, plan, conversions, coercions, combined_re, start_re, adapter, dump_models
 
     @staticmethod
     def parse_template(template, model_map=None):
-        pattern = r"\{(\w+):(\w+(\[[^\]]+\])?)(:regex=([^\}:]+))?(?::(\w+))?\}"
         fields = {}
         segments = []
         last_end = 0
@@ -241,13 +707,13 @@ class TemplateParser:
             "float": float,
             "str": str,
             "bool": bool,
-            "list[str]": List[str],
-            "list[int]": List[int],
+            "list[str]": _LIST_STR,
+            "list[int]": _LIST_INT,
             "dict": dict,
             "json": Any,
             "any": Any,
         }
-        for m in re.finditer(pattern, template):
+        for m in _FIELD_RE.finditer(template):
             name, typ, _, _, regex, model_name = m.groups()
             segments.append(template[last_end:m.start()])
             last_end = m.end()
@@ -265,194 +731,172 @@ class TemplateParser:
     def locate_template_segment(self, llm_output):
         start_str = self.segments[0]
         end_str = self.segments[-1]
-        start_idx = llm_output.find(start_str)
+        # 输出恰好以起始/结尾标识开头、结尾时（最常见的情况）不需要查找
+        start_idx = 0 if llm_output.startswith(start_str) else llm_output.find(start_str)
         if start_idx == -1:
             raise ValueError(f"输出中未找到模板起始标识 '{start_str}'")
         if end_str:
-            end_idx = llm_output.rfind(end_str, start_idx)
+            if llm_output.endswith(end_str) and len(llm_output) - len(end_str) >= start_idx:
+                end_idx = len(llm_output) - len(end_str)
+            else:
+                end_idx = llm_output.rfind(end_str, start_idx)
             if end_idx == -1:
                 raise ValueError(f"输出中未找到模板结尾标识 '{end_str}'")
             return llm_output[start_idx:end_idx + len(end_str)]
         else:
             return llm_output[start_idx:]
 
-    def strict_parse_llm_output(self, matched_output):
+    @staticmethod
+    def _field_kind(typ):
+        if _is_model_type(typ):
+            return "json"
+        return _FIELD_KINDS.get(typ, "str")
+
+    @staticmethod
+    def _field_converter(name, typ, strict=True, coerce=False):
+        # coerce=False（validate 使用）时 int/float/bool 等标量保留字符串，由 _validate_data 中的 pydantic 一次完成转换；
+        # coerce=True 时 bool 字段在这里转换为 True/False，与直接调用 strict_parse_llm_output 的原有结果一致
+        if _is_model_type(typ):
+            return _model_converter(name, typ, strict)
+        elif typ is bool:
+            return _to_bool if coerce else None
+        elif typ in _LIST_TYPES or typ is dict:
+            return _json_or_literal
+        elif typ is Any:
+            return _json_or_raw
+        return None
+
+    @classmethod
+    def _build_plan(cls, fields, segments, strict):
+        """预先确定每个字段的起始分割符、定位方式、取值方式和类型转换函数，解析时不再做类型判断。
+
+        返回 (plan, conversions, coercions)：plan 按字段顺序给出扫描所需的信息，
+        conversions 只包含确实需要转换的 (字段名, 转换函数)，str 等字段不再参与第二轮遍历；
+        coercions 在 conversions 之外还包含 bool 字段的转换，供 coerce=True 时使用。
+        """
+        plan = []
+        conversions = []
+        coercions = []
+        for i, (name, field) in enumerate(fields.items()):
+            typ = field[0]
+            kind = cls._field_kind(typ)
+            seg_start = segments[i]
+            # seg_start 为空时按类型定位值的起始位置
+            locate = _LOCATORS.get(kind) if not seg_start else None
+            # BaseModel 字段取原文，由 pydantic 一次完成 JSON 解析和校验
+            take = _value_taker(name, kind, segments[i + 1], keep_text=_is_model_type(typ))
+            plan.append((name, seg_start, len(seg_start), kind, locate, take))
+            convert = cls._field_converter(name, typ, strict)
+            if convert is not None:
+                conversions.append((name, convert))
+            coerce = cls._field_converter(name, typ, strict, coerce=True)
+            if coerce is not None:
+                coercions.append((name, coerce))
+        return tuple(plan), tuple(conversions), tuple(coercions)
+
+    @classmethod
+    def _build_combined_re(cls, fields, segments):
+        """所有字段都以非空分割符结尾、且不是 JSON/列表时，把整个模板编译成一个正则，一次匹配取出全部字段。
+
+        每个字段写成先行断言 (?=(.*?)结尾分割符)，再用反向引用吃掉捕获的内容和分割符。先行断言成立后不会回溯，
+        效果等同原子组（Python 3.10 的 re 不支持 (?>...)），只取到结尾分割符第一次出现的位置，与逐字段 find 的结果一致。
+        其他模板返回 None。
+        """
+        kinds = [cls._field_kind(field[0]) for field in fields.values()]
+        if not kinds or any(kind in _BRACKETS for kind in kinds) or not all(segments[1:]):
+            return None
+        # 起始分割符为空时 int/float/bool 需要按类型定位，不能直接从开头取值
+        if not segments[0] and kinds[0] != "str":
+            return None
+        pattern = re.escape(segments[0]) + "".join(
+            f"(?=(.*?){re.escape(seg)})(?:\\{i}){re.escape(seg)}" for i, seg in enumerate(segments[1:], 1)
+        )
+        return re.compile(pattern, re.DOTALL)
+
+    def strict_parse_llm_output(self, matched_output, coerce=True):
+        """
+        coerce: 是否在这里完成 bool 等字段的类型转换（直接调用时的默认行为）；
+                validate 传入 False，标量字段保留字符串，由 pydantic 一次完成转换。
+        """
+        conversions = self._coercions if coerce else self._conversions
+        # 较短的输出直接用整体正则匹配；匹配失败时走逐字段解析，给出具体的错误信息
+        if self._combined_re is not None and len(matched_output) <= _COMBINED_MAX_LEN:
+            m = self._combined_re.match(matched_output)
+            if m is not None:
+                result = {name: value.strip() for name, value in zip(self.fields, m.groups())}
+                # 整体正则只用于不含 JSON/列表字段的模板，这里只会有 bool 字段的转换
+                for name, convert in conversions:
+                    result[name] = convert(result[name])
+                return result
         result = {}
         idx = 0
-        for i, name in enumerate(self.fields.keys()):
-            seg_start = self.segments[i]
-            seg_end = self.segments[i+1]
-            typ = self.fields[name][0]
+        for name, seg_start, start_len, kind, locate, take in self._plan:
             if seg_start:
                 if not matched_output.startswith(seg_start, idx):
                     raise ValueError(f"输出格式错误，期望 '{seg_start}'")
-                idx += len(seg_start)
-            else:
+                idx += start_len
+            elif locate is not None:
                 # seg_start 为空时，根据类型自动定位
-                if typ == int:
-                    m = re.search(r"\d+", matched_output[idx:])
-                    if m:
-                        idx += m.start()
-                    else:
-                        raise ValueError(f"未找到字段 {name} 的整数值")
-                elif typ == float:
-                    m = re.search(r"\d+(\.\d+)?", matched_output[idx:])
-                    if m:
-                        idx += m.start()
-                    else:
-                        raise ValueError(f"未找到字段 {name} 的浮点值")
-                elif typ == bool:
-                    m = re.search(r"(true|false|True|False|1|0)", matched_output[idx:])
-                    if m:
-                        idx += m.start()
-                    else:
-                        raise ValueError(f"未找到字段 {name} 的布尔值")
-                elif typ in [List[str], List[int]]:
-                    m = re.search(r"\[.*?\]", matched_output[idx:])
-                    if m:
-                        idx += m.start()
-                    else:
-                        raise ValueError(f"未找到字段 {name} 的列表值")
-                elif typ == dict or typ == Any or (isinstance(typ, type) and issubclass(typ, BaseModel)):
-                    m = re.search(r"\{.*\}", matched_output[idx:], re.DOTALL)
-                    if m:
-                        idx += m.start()
-                    else:
-                        raise ValueError(f"未找到字段 {name} 的 JSON/dict 值")
-
-            if seg_end:
-                remain = matched_output[idx:]
-                # 优先处理复杂类型
-                if (typ == dict or typ == Any or (isinstance(typ, type) and issubclass(typ, BaseModel))) and remain.startswith("{"):
-                    count = 0
-                    for i, c in enumerate(remain):
-                        if c == "{":
-                            count += 1
-                        elif c == "}":
-                            count -= 1
-                            if count == 0:
-                                value = remain[:i+1].strip()
-                                idx += i+1
-                                break
-                    else:
-                        # 没有闭合，退回分割符处理
-                        next_pos = remain.find(seg_end)
-                        if next_pos == -1:
-                            raise ValueError(f"输出格式错误，缺少 '{seg_end}'")
-                        value = remain[:next_pos].strip()
-                        idx += next_pos
-                elif typ in [List[str], List[int]] and remain.startswith("["):
-                    count = 0
-                    for i, c in enumerate(remain):
-                        if c == "[":
-                            count += 1
-                        elif c == "]":
-                            count -= 1
-                            if count == 0:
-                                value = remain[:i+1].strip()
-                                idx += i+1
-                                break
-                    else:
-                        next_pos = remain.find(seg_end)
-                        if next_pos == -1:
-                            raise ValueError(f"输出格式错误，缺少 '{seg_end}'")
-                        value = remain[:next_pos].strip()
-                        idx += next_pos
-                else:
-                    # 统一用分割符处理
-                    next_pos = remain.find(seg_end)
-                    if next_pos == -1:
-                        raise ValueError(f"输出格式错误，缺少 '{seg_end}'")
-                    value = remain[:next_pos].strip()
-                    idx += next_pos
-            else:
-                # 自动识别类型结尾
-                remain = matched_output[idx:]
-                if typ == int:
-                    m = re.match(r"^(\d+)", remain)
-                    if m:
-                        value = m.group(1)
-                        idx += len(value)
-                    else:
-                        raise ValueError(f"结尾字段 {name} 不是合法整数")
-                elif typ == float:
-                    m = re.match(r"^(\d+(\.\d+)?)", remain)
-                    if m:
-                        value = m.group(1)
-                        idx += len(value)
-                    else:
-                        raise ValueError(f"结尾字段 {name} 不是合法浮点数")
-                elif typ == bool:
-                    m = re.match(r"^(true|false|True|False|1|0)", remain)
-                    if m:
-                        value = m.group(1)
-                        idx += len(value)
-                    else:
-                        value = remain.strip()
-                        idx = len(matched_output)
-                elif typ in [List[str], List[int]]:
-                    # 匹配列表内容，遇到第一个闭合方括号
-                    m = re.match(r"^(\[.*?\])", remain)
-                    if m:
-                        value = m.group(1)
-                        idx += len(value)
-                    else:
-                        raise ValueError(f"结尾字段 {name} 不是合法列表")
-                elif typ == dict or typ == Any or (isinstance(typ, type) and issubclass(typ, BaseModel)):
-                    # 用括号计数法提取完整 JSON
-                    remain = matched_output[idx:]
-                    if remain.startswith("{"):
-                        count = 0
-                        for i, c in enumerate(remain):
-                            if c == "{":
-                                count += 1
-                            elif c == "}":
-                                count -= 1
-                                if count == 0:
-                                    value = remain[:i+1]
-                                    idx += i+1
-                                    break
-                        else:
-                            # 没有闭合
-                            value = remain.strip()
-                            idx = len(matched_output)
-                else:
-                    # 默认取剩余内容
-                    value = remain.strip()
-                    idx = len(matched_output)
+                pos = locate(matched_output, idx)
+                if pos == -1:
+                    raise ValueError(f"未找到字段 {name} 的{_LOCATE_LABELS[kind]}")
+                idx = pos
+
+            # 按字段预先选好的提取函数取值，返回值和下一字段的起始位置
+            value, idx = take(matched_output, idx)
             result[name] = value
         # 自动类型转换和嵌套模型校验
-        for name, field in self.fields.items():
-            typ = field[0]
-            val = result[name]
-            if isinstance(typ, type) and issubclass(typ, BaseModel):
-                try:
-                    json_obj = json.loads(val)
-                    # 严格用 jsonschema 校验
-                    schema: JsonSchemaValue = typ.model_json_schema()
-                    jsonschema_validate(instance=json_obj, schema=schema)
-                    result[name] = typ.model_validate(json_obj)
-                except (JsonSchemaError, Exception) as e:
-                    raise ValueError(f"字段 {name} 不符合 schema: {e}")
-            elif typ == bool:
-                if isinstance(val, str):
-                    if val.lower() in ("true", "1"):
-                        result[name] = True
-                    elif val.lower() in ("false", "0"):
-                        result[name] = False
-            elif typ in [List[str], List[int], dict]:
-                try:
-                    result[name] = eval(val)
-                except Exception:
-                    pass
-            elif typ == Any:
-                try:
-                    result[name] = json.loads(val)
-                except Exception:
-                    result[name] = val
+        for name, convert in conversions:
+            result[name] = convert(result[name])
         return result
 
+    def _validate_data(self, data):
+        """与 self.DynamicModel(**data).model_dump() 结果一致。"""
+        validated = self._adapter.validate_python(data)
+        if self._dump_models:
+            # 嵌套的 BaseModel 字段转换为 dict
+            validated = self._adapter.dump_python(validated)
+        return validated
+
     def validate(self, llm_output):
+        if self._memo is None:
+            return self._validate(llm_output)
+        result = self._memo.get(llm_output)
+        if result is None:
+            result = self._validate(llm_output)
+            self._memo.put(llm_output, result)
+        # 只复制外层两层，避免深拷贝让缓存命中比重新解析还慢
+        return _copy_result(result)
+
+    def validate_many(self, llm_outputs, workers=None):
+        """批量校验多个输出，返回结果列表，顺序与输入一致。
+
+        批量较大时用进程池并行校验，每个子进程按 template/model_map 重建一次解析器，
+        因此 model_map 中的模型类需要能被 pickle（定义在模块顶层）。
+        """
+        llm_outputs = list(llm_outputs)
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1 or len(llm_outputs) < _PARALLEL_MIN_BATCH:
+            return [self.validate(out) for out in llm_outputs]
+        chunksize = max(1, len(llm_outputs) // (workers * 4))
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(self.template, self.model_map, self.strict),
+        ) as ex:
+            return list(ex.map(_validate_in_worker, llm_outputs, chunksize=chunksize))
+
+    def _segments_in_order(self, candidate):
+        """候选文本中模板的中间分割符是否按顺序出现，不满足时严格解析必然失败。"""
+        pos = len(self.segments[0])
+        for seg in self.segments[1:-1]:
+            p = candidate.find(seg, pos)
+            if p == -1:
+                return False
+            pos = p + len(seg)
+        return True
+
+    def _validate(self, llm_output):
         llm_output = strip_think_tags(llm_output)
         # 如果模板起始段为空，则直接尝试对整个输出进行严格解析一次
         start_str = self.segments[0]
@@ -465,11 +909,10 @@ class TemplateParser:
         if not start_str:
             try:
                 matched_output = llm_output
-                data = self.strict_parse_llm_output(matched_output)
-                validated = self.DynamicModel(**data)
+                data = self.strict_parse_llm_output(matched_output, coerce=False)
                 return {
                     "success": True,
-                    "data": validated.model_dump(),
+                    "data": self._validate_data(data),
                     "matched_output": matched_output
                 }
             except (ValidationError, ValueError) as e:
@@ -480,27 +923,34 @@ class TemplateParser:
                 }
 
         # 查找所有可能的起始位置，逐个尝试
-        matches = [m for m in re.finditer(re.escape(start_str), llm_output)]
-        # for m in reversed(matches):
-        for m in matches:
-            start_idx = m.start()
-            # 定位对应的结尾位置
-            if end_str:
-                end_idx = llm_output.rfind(end_str, start_idx)
-                if end_idx == -1:
-                    # 没有找到对应结尾，跳过该起始位置
-                    continue
-                candidate = llm_output[start_idx:end_idx + len(end_str)]
-            else:
-                candidate = llm_output[start_idx:]
+        matches = list(self._start_re.finditer(llm_output))
+        # 各候选位置对应的结尾都是最后一个结尾标识，只需查找一次
+        last_end_idx = llm_output.rfind(end_str) if end_str else -1
+        # 有对应结尾的起始位置才是候选
+        if end_str:
+            starts = [m.start() for m in matches if m.start() <= last_end_idx]
+            end_pos = last_end_idx + len(end_str)
+        else:
+            starts = [m.start() for m in matches]
+            end_pos = len(llm_output)
+        for start_idx in starts:
+            candidate = llm_output[start_idx:end_pos]
+            # 先用 str.find 检查分割符顺序。靠后的候选都是当前候选的后缀，
+            # 当前候选不满足时之后的候选也必然失败，直接用最后一个候选得到错误信息
+            if not self._segments_in_order(candidate):
+                last_candidate = llm_output[starts[-1]:end_pos]
+                try:
+                    self.strict_parse_llm_output(last_candidate, coerce=False)
+                except (ValidationError, ValueError) as e:
+                    last_err = e
+                break
 
             last_candidate = candidate
             try:
-                data = self.strict_parse_llm_output(candidate)
-                validated = self.DynamicModel(**data)
+                data = self.strict_parse_llm_output(candidate, coerce=False)
                 return {
                     "success": True,
-                    "data": validated.model_dump(),
+                    "data": self._validate_data(data),
                     "matched_output": candidate
                 }
             except (ValidationError, ValueError) as e:
@@ -524,6 +974,40 @@ class TemplateParser:
             }
 
     def get_format_instructions(self):
+        return self._format_instructions
+
+    @staticmethod
+    def _example_for_type(typ):
+        """字段类型对应的格式示例值。"""
+        # BaseModel 子类
+        if _is_model_type(typ):
+            return _example_json_for_model(typ)
+        value = _TYPE_EXAMPLES.get(typ)
+        if value is not None:
+            return value
+        origin = get_origin(typ)
+        # 其他 typing.List / list
+        if origin in (list, List) or typ is list:
+            args = get_args(typ)
+            item_type = args[0] if args else None
+            if item_type == str:
+                return _EXAMPLE_VALUES["list[str]"]
+            elif item_type == int:
+                return _EXAMPLE_VALUES["list[int]"]
+            return "[...]"
+        # typing.Dict / dict
+        if origin in (dict, Dict):
+            return _EXAMPLE_VALUES["dict"]
+        # 兜底
+        return "示例内容"
+
+    @functools.cached_property
+    def _field_example_values(self):
+        return {name: self._example_for_type(field[0]) for name, field in self.fields.items()}
+
+    @functools.cached_property
+    def _format_instructions(self):
+        # 模板和 model_map 在构造后不再变化，格式说明只需生成一次
         instructions = (
             "请严格按照如下格式输出，直接输出指定输出格式的内容，不要输出任何解释或者思考的文本：\n"
             "变量值需替换模板中的变量定义部分（如 {name:str}），其他内容保持所有字符完全一致，包括所有标点符号及其中英文差别\n"
@@ -533,76 +1017,31 @@ class TemplateParser:
             f"{self.template}\n\n"
             "输出的格式示例如下：\n"
         )
-        example = self.template
-        example_values = {
-            "int": "42",
-            "float": "3.14",
-            "str": "示例内容",
-            "bool": "true",
-            "list[str]": "[\"A\", \"B\"]",
-            "list[int]": "[1, 2]",
-            "dict": "{\"key\": \"value\"}",
-            "json": "{\"foo\": \"bar\", \"num\": 1}",
-            "any": "{\"foo\": \"bar\"}"
-        }
-        for name, field in self.fields.items():
-            typ = field[0]
-            origin = get_origin(typ)
-            args = get_args(typ)
-            # BaseModel 子类
-            if isinstance(typ, type) and issubclass(typ, BaseModel):
-                # 使用全局的 schema -> example 生成更准确的示例值
-                try:
-                    schema = typ.model_json_schema()
-                    example_obj = _schema_to_example(schema, typ)
-                    if example_obj is None:
-                        fields = list(typ.model_fields.keys())
-                        value_dict = {f: f"示例值" for f in fields}
-                        value = json.dumps(value_dict, ensure_ascii=False)
-                    else:
-                        value = json.dumps(example_obj, ensure_ascii=False)
-                except Exception:
-                    fields = list(typ.model_fields.keys())
-                    value_dict = {f: f"示例值" for f in fields}
-                    value = json.dumps(value_dict, ensure_ascii=False)
-            # typing.List / list
-            elif origin in (list, List) or typ is list:
-                item_type = args[0] if args else None
-                if item_type == str:
-                    value = example_values["list[str]"]
-                elif item_type == int:
-                    value = example_values["list[int]"]
-                else:
-                    value = "[...]"
-            # typing.Dict / dict
-            elif origin in (dict, Dict) or typ is dict:
-                value = example_values["dict"]
-            # typing.Any
-            elif typ is Any:
-                value = example_values["json"]
-            # 原始类型 int/float/str/bool
-            elif typ in (int,):
-                value = example_values["int"]
-            elif typ in (float,):
-                value = example_values["float"]
-            elif typ in (bool,):
-                value = example_values["bool"]
-            elif typ in (str,):
-                value = example_values["str"]
-            else:
-                # 兜底
-                value = "示例内容"
-            example = re.sub(rf"\{{{name}:[^\}}]+\}}", value, example)
+        # 一次扫描模板，按变量名替换为示例值
+        value_by_name = self._field_example_values
+        # 与 parse_template 使用同一匹配模式，替换的正是解析出的字段
+        example = _FIELD_RE.sub(lambda m: value_by_name.get(m.group(1), m.group(0)), self.template)
         instructions +=  example 
         if self.model_map:
             instructions += "\n所有可用 json 类型变量的 schema 如下：\n"
             for model_name, model_cls in self.model_map.items():
                 if issubclass(model_cls, BaseModel):
-                    schema = model_cls.model_json_schema()
-                    instructions += f"{model_name} 的 schema:\n{json.dumps(schema, ensure_ascii=False)}\n"
+                    instructions += f"{model_name} 的 schema:\n{_schema_json_for_model(model_cls)}\n"
         return instructions
 
 
+# validate_many 子进程中的解析器，由 _init_worker 创建
+_worker_parser = None
+
+
+def _init_worker(template, model_map, strict):
+    global _worker_parser
+    _worker_parser = TemplateParser(template, model_map, strict)
+
+
+def _validate_in_worker(llm_output):
+    return _worker_parser.validate(llm_output)
+
 
 if __name__ == "__main__":
     class ListDictModel(BaseModel):
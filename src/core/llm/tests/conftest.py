@@ -0,0 +1,108 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+import pytest
+import pytest_asyncio
+
+# uvloop 为可选依赖，未安装或在 Windows 上时使用默认的 asyncio 事件循环
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+
+if uvloop is not None and sys.platform != "win32":
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_asyncio_loop_factories(config, item):
+        """所有异步测试和 fixture 运行在 uvloop 上，降低任务调度开销"""
+        return {"uvloop": uvloop.new_event_loop}
+
+
+@pytest.fixture(scope="session")
+def llm():
+    """整个测试会话共用一个 LLM 实例，复用底层 HTTP 客户端和连接池"""
+    # 在 fixture 内导入，只有用到 llm 的测试才需要加载 LLM 依赖
+    from ..llm import LLM
+    return LLM()
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def mcp_llm():
+    """整个测试会话共用一个连接了 demo MCP 服务器的 LLM，服务器进程和握手只做一次"""
+    from ..llm import LLM
+    try:
+        from ..mcp_client import MCPServerConfig, MCPTransportType, MCP_AVAILABLE
+    except ImportError:
+        MCP_AVAILABLE = False
+    if not MCP_AVAILABLE:
+        pytest.skip("MCP功能不可用，跳过测试")
+    mcp_configs = [
+        MCPServerConfig(
+            name="demo",
+            command="python",
+            args=["-m", "src.core.llm.demo.demo_mcp_server"],
+            transport=MCPTransportType.STDIO
+        )
+    ]
+    llm = LLM(mcp_configs=mcp_configs)
+    await llm.init_mcp()
+    try:
+        yield llm
+    finally:
+        await llm.cleanup_mcp()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port, proc, timeout=15.0):
+    """等待本地端口可连接；服务器进程提前退出或超时则报错"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"demo MCP HTTP 服务器启动失败，退出码 {proc.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"demo MCP HTTP 服务器未在 {timeout} 秒内监听端口 {port}")
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def mcp_http_llm():
+    """
+    并发性能测试专用：demo MCP 服务器以 streamable-http 方式常驻，
+    请求可在多个 HTTP 连接上并发处理，不再经由单条 stdio 管道串行
+    """
+    if not os.getenv("RUN_PERFORMANCE_TESTS"):
+        pytest.skip("性能测试默认跳过，设置环境变量 RUN_PERFORMANCE_TESTS=1 来运行")
+    from ..llm import LLM
+    try:
+        from ..mcp_client import create_http_mcp_config, MCP_AVAILABLE
+    except ImportError:
+        MCP_AVAILABLE = False
+    if not MCP_AVAILABLE:
+        pytest.skip("MCP功能不可用，跳过测试")
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "src.core.llm.demo.demo_mcp_server", "--http", "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_for_port(port, proc)
+        llm = LLM(mcp_configs=[create_http_mcp_config("demo", f"http://127.0.0.1:{port}")])
+        await llm.init_mcp()
+        try:
+            yield llm
+        finally:
+            await llm.cleanup_mcp()
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
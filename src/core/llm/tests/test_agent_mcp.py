@@ -2,11 +2,10 @@
 测试Agent的MCP功能
 """
 import asyncio
-import sys
 import os
+import time
 import pytest
-
-# 添加项目根目录到路径
+import pytest_asyncio
 
 from ..agent import Agent, create_agent_with_tools, create_agent_with_mcp
 
@@ -17,308 +16,250 @@ except ImportError:
     MCP_AVAILABLE = False
 
 
+# 计时段的超时上限（秒），避免 LLM 服务卡住时测试无限挂起
+_TIMED_SECTION_TIMEOUT = 300
+# 并行相对串行的最低加速比：默认只要求并行快于串行（>1x），
+# 真实 LLM 延迟波动大，需要更严格的下限时通过环境变量 MIN_PARALLEL_SPEEDUP 设置
+_MIN_PARALLEL_SPEEDUP = float(os.getenv("MIN_PARALLEL_SPEEDUP", "1.0"))
+
+
+async def _run_concurrently(coros):
+    """并发执行协程并按顺序返回结果"""
+    if not hasattr(asyncio, "TaskGroup"):
+        # Python 3.10 没有 TaskGroup
+        return await asyncio.gather(*coros)
+    # TaskGroup 在任一任务失败时取消其余任务，并保留原始异常与调用栈
+    async with asyncio.TaskGroup() as tg:
+        tasks = [tg.create_task(c) for c in coros]
+    return [t.result() for t in tasks]
+
+
+def _demo_mcp_configs():
+    """demo MCP服务器配置（STDIO）"""
+    return [
+        MCPServerConfig(
+            name="demo",
+            command="python",
+            args=["-m", "src.core.llm.demo.demo_mcp_server"],
+            transport=MCPTransportType.STDIO
+        )
+    ]
+
+
+async def _create_mcp_agent(mcp_configs):
+    """创建支持MCP的Agent并完成MCP连接初始化"""
+    agent = create_agent_with_mcp(
+        mcp_configs=mcp_configs,
+        max_iterations=6
+    )
+    await agent.init_mcp()
+    return agent
+
+
+@pytest.fixture(scope="module")
+def mcp_configs():
+    """模块内共用的MCP服务器配置"""
+    if not MCP_AVAILABLE:
+        pytest.skip("MCP功能不可用，跳过测试")
+    return _demo_mcp_configs()
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def mcp_agent(mcp_configs):
+    """整个模块共用一个MCP Agent，MCP服务器进程和握手只做一次"""
+    agent = await _create_mcp_agent(mcp_configs)
+    try:
+        yield agent
+    finally:
+        # 清理MCP连接
+        await agent.cleanup_mcp()
+
+
+@pytest.fixture
+def agent(mcp_agent):
+    """每个测试使用干净的对话历史，结束后恢复传统工具配置"""
+    mcp_agent.clear_history()
+    original_tools = mcp_agent.tools.copy()
+    original_caller = mcp_agent.tool_caller
+    try:
+        yield mcp_agent
+    finally:
+        mcp_agent.tools = original_tools
+        mcp_agent.tool_caller = original_caller
+
+
+# 传统工具（模块级定义，注册时的签名解析不随每次测试重复构造函数对象）
+def subtract(a: float, b: float) -> float:
+    """减法工具"""
+    return a - b
+
+
+def divide(a: float, b: float) -> float:
+    """除法工具"""
+    if b == 0:
+        return "除数不能为零"
+    return a / b
+
+
+def sample_tool(x: int) -> str:
+    """示例工具（不以 test_ 开头，避免被 pytest 当作测试收集）"""
+    return f"测试工具处理了数字: {x}"
+
+
 class TestAgentMCP:
     """Agent MCP功能测试类"""
     
-    @pytest.mark.asyncio
-    async def test_mcp_agent_async(self):
+    @pytest.mark.asyncio(loop_scope="module")
+    async def test_mcp_agent_async(self, agent, record_property):
         """测试异步MCP Agent功能"""
         if not MCP_AVAILABLE:
             pytest.skip("MCP功能不可用，跳过测试")
         
-        print("=== 测试异步MCP Agent功能 ===")
-        
-        # 创建MCP配置
-        mcp_configs = [
-            MCPServerConfig(
-                name="demo",
-                command="python",
-                args=["-m", "src.core.llm.demo.demo_mcp_server"],
-                transport=MCPTransportType.STDIO
-            )
-        ]
-        
         try:
-            # 创建支持MCP的Agent
-            agent = create_agent_with_mcp(
-                mcp_configs=mcp_configs,
-                
-                max_iterations=5
-            )
-            
-            # 初始化MCP连接
-            print("初始化MCP连接...")
-            await agent.init_mcp()
-            
             # 获取可用工具
             tools = agent.get_available_tools()
-            print(f"可用工具: {tools}")
             assert len(tools) > 0
             
-            # 测试异步MCP工具调用
-            print("\n--- 测试异步MCP计算工具 ---")
-            result1 = await agent.chat_async("请使用calculate工具计算 15 × 3", use_mcp=True)
-            print(f"结果: {result1['final_response']}")
-            print(f"工具调用: {result1['tool_calls']}")
+            # 测试异步MCP工具调用：三个调用互不依赖，并发执行
+            start_time = time.perf_counter()
+            result1, result2, result3 = await asyncio.gather(
+                agent.chat_async("请使用calculate工具计算 15 × 3", use_mcp=True),
+                agent.chat_async("请获取当前时间", use_mcp=True),
+                agent.chat_async("请查询北京的天气", use_mcp=True),
+            )
+            record_property("mcp_calls_seconds", time.perf_counter() - start_time)
             
-            # 验证结果
-            assert result1['success'] == True
+            # 验证计算结果
+            assert result1['success'] == True, result1['final_response']
             assert len(result1['tool_calls']) > 0
             assert 'calculate' in result1['tool_calls'][0]['name']
             
-            # 测试获取时间
-            print("\n--- 测试异步获取时间 ---")
-            result2 = await agent.chat_async("请获取当前时间", use_mcp=True)
-            print(f"结果: {result2['final_response']}")
-            print(f"工具调用: {result2['tool_calls']}")
-            
             # 验证时间结果
-            assert result2['success'] == True
+            assert result2['success'] == True, result2['final_response']
             assert len(result2['tool_calls']) > 0
             assert 'get_current_time' in result2['tool_calls'][0]['name']
             
-            # 测试天气查询
-            print("\n--- 测试异步天气查询 ---")
-            result3 = await agent.chat_async("请查询北京的天气", use_mcp=True)
-            print(f"结果: {result3['final_response']}")
-            print(f"工具调用: {result3['tool_calls']}")
-            
             # 验证天气结果
-            assert result3['success'] == True
+            assert result3['success'] == True, result3['final_response']
             
         except Exception as e:
-            print(f"异步MCP Agent测试出错: {e}")
             pytest.fail(f"异步MCP测试失败: {e}")
-        finally:
-            # 清理MCP连接
-            await agent.cleanup_mcp()
 
-    @pytest.mark.asyncio
-    async def test_mixed_agent_async(self):
+    @pytest.mark.asyncio(loop_scope="module")
+    async def test_mixed_agent_async(self, agent, record_property):
         """测试异步混合使用传统工具和MCP工具的Agent"""
         if not MCP_AVAILABLE:
             pytest.skip("MCP功能不可用，跳过混合测试")
         
-        print("=== 测试异步混合Agent功能 ===")
-        
-        # 定义传统工具
-        def subtract(a: float, b: float) -> float:
-            """减法工具"""
-            return a - b
-
-        def divide(a: float, b: float) -> float:
-            """除法工具"""
-            if b == 0:
-                return "除数不能为零"
-            return a / b
-
-        # 创建MCP配置
-        mcp_configs = [
-            MCPServerConfig(
-                name="demo",
-                command="python",
-                args=["-m", "src.core.llm.demo.demo_mcp_server"],
-                transport=MCPTransportType.STDIO
-            )
-        ]
-        
         try:
-            # 创建支持混合工具的Agent
-            agent = Agent(
-                
-                max_iterations=6,
-                mcp_configs=mcp_configs
-            )
-            
-            # 注册传统工具
+            # 在共用的MCP Agent上注册传统工具（测试结束后由 agent fixture 恢复）
             agent.register_tools([subtract, divide])
             
-            # 初始化MCP连接
-            await agent.init_mcp()
-            
             # 获取所有可用工具
             tools = agent.get_available_tools()
-            print(f"所有可用工具: {tools}")
             assert len(tools) > 0
             
-            # 测试异步传统工具
-            print("\n--- 使用异步传统工具 ---")
-            result1 = await agent.chat_async("请使用工具计算 10 - 3", use_tools=True, use_mcp=False)
-            print(f"传统工具结果: {result1['final_response']}")
-            print(f"工具调用: {result1['tool_calls']}")
+            # 传统工具、MCP工具和简单聊天互不依赖，并发执行
+            start_time = time.perf_counter()
+            result1, result2, simple_result = await asyncio.gather(
+                agent.chat_async("请使用工具计算 10 - 3", use_tools=True, use_mcp=False),
+                agent.chat_async("请使用工具获取当前时间", use_mcp=True),
+                agent.simple_chat_async("你好，请介绍一下你自己"),
+            )
+            record_property("mixed_calls_seconds", time.perf_counter() - start_time)
             
             # 验证传统工具结果
-            assert result1['success'] == True
+            assert result1['success'] == True, result1['final_response']
             assert len(result1['tool_calls']) > 0
             assert result1['tool_calls'][0]['name'] == 'subtract'
             
-            # 测试异步MCP工具
-            print("\n--- 使用异步MCP工具 ---")
-            result2 = await agent.chat_async("请使用工具获取当前时间", use_mcp=True)
-            print(f"MCP工具结果: {result2['final_response']}")
-            print(f"工具调用: {result2['tool_calls']}")
-            
             # 验证MCP工具结果
-            assert result2['success'] == True
+            assert result2['success'] == True, result2['final_response']
             assert len(result2['tool_calls']) > 0
             
-            # 测试简单聊天接口
-            print("\n--- 测试简单异步聊天 ---")
-            simple_result = await agent.simple_chat_async("你好，请介绍一下你自己")
-            print(f"简单聊天结果: {simple_result}")
+            # 验证简单聊天接口
             assert isinstance(simple_result, str)
             assert len(simple_result) > 0
             
-            # 测试异步带工具聊天
-            print("\n--- 测试异步带工具聊天 ---")
-            def test_tool(x: int) -> str:
-                return f"测试工具处理了数字: {x}"
-            
+            # 测试异步带工具聊天（会临时替换 agent 的工具，不能与上面的调用并发）
             tool_result = await agent.chat_with_tools_async(
-                "请使用test_tool处理数字42", 
-                tools=[test_tool]
+                "请使用sample_tool处理数字42", 
+                tools=[sample_tool]
             )
-            print(f"带工具聊天结果: {tool_result['final_response']}")
-            assert tool_result['success'] == True
+            assert tool_result['success'] == True, tool_result['final_response']
             
         except Exception as e:
-            print(f"异步混合Agent测试出错: {e}")
             pytest.fail(f"异步混合测试失败: {e}")
-        finally:
-            await agent.cleanup_mcp()
 
-    @pytest.mark.asyncio 
-    async def test_parallel_agent_calls(self):
+    @pytest.mark.asyncio(loop_scope="module")
+    async def test_parallel_agent_calls(self, agent, record_property):
         """测试Agent的并行异步调用"""
         if not MCP_AVAILABLE:
             pytest.skip("MCP功能不可用，跳过并行测试")
         
-        print("=== 测试Agent并行异步调用 ===")
-        
-        # 创建MCP配置
-        mcp_configs = [
-            MCPServerConfig(
-                name="demo",
-                command="python",
-                args=["-m", "src.core.llm.demo.demo_mcp_server"],
-                transport=MCPTransportType.STDIO
-            )
+        # 并行执行多个异步调用：信号量限制同时在途的请求数，避免单条 stdio 管道上的队头阻塞
+        prompts = [
+            "请获取当前时间",
+            "请使用echo_message工具重复'并行测试1'",
+            "请使用calculate工具计算 5 + 5",
+            "请使用echo_message工具重复'并行测试2'",
+            "请使用calculate工具计算 12 × 4",
+            "请查询北京的天气",
+            "请使用echo_message工具重复'并行测试3'",
+            "请使用calculate工具计算 100 - 58",
         ]
-        
-        try:
-            # 创建Agent
-            agent = create_agent_with_mcp(
-                mcp_configs=mcp_configs,
-                max_iterations=3
-            )
-            
-            await agent.init_mcp()
-            
-            # 并行执行多个异步调用
-            print("\n--- 并行执行多个异步调用 ---")
-            import time
-            start_time = time.time()
-            
-            tasks = [
-                agent.chat_async("请获取当前时间", use_mcp=True),
-                agent.chat_async("请使用echo_message工具重复'并行测试1'", use_mcp=True),
-                agent.chat_async("请使用calculate工具计算 5 + 5", use_mcp=True)
-            ]
-            
-            results = await asyncio.gather(*tasks)
-            parallel_time = time.time() - start_time
-            
-            print(f"并行执行完成，耗时: {parallel_time:.2f}秒")
-            print(f"执行了 {len(results)} 个并行任务")
-            
-            # 验证所有结果
-            for i, result in enumerate(results):
-                print(f"任务 {i+1} 结果: {result['final_response']}")
-                assert result['success'] == True
-                assert len(result['tool_calls']) > 0
-            
-            # 对比串行执行时间
-            print("\n--- 对比串行执行 ---")
-            start_time = time.time()
-            
-            serial_results = []
-            for task_prompt in [
-                "请获取当前时间",
-                "请使用echo_message工具重复'串行测试'", 
-                "请使用calculate工具计算 3 + 3"
-            ]:
-                result = await agent.chat_async(task_prompt, use_mcp=True)
-                serial_results.append(result)
-            
-            serial_time = time.time() - start_time
-            print(f"串行执行完成，耗时: {serial_time:.2f}秒")
-            
-            # 性能对比
-            if parallel_time > 0:
-                speedup = serial_time / parallel_time
-                print(f"并行加速比: {speedup:.2f}x")
-                
-                # 并行应该比串行快（虽然可能不明显）
-                if speedup > 1.1:
-                    print("✅ 并行执行确实提供了性能提升")
-                else:
-                    print("⚠️  并行提升不明显，可能受限于资源竞争")
-            
-        except Exception as e:
-            print(f"并行测试出错: {e}")
-            pytest.fail(f"并行测试失败: {e}")
-        finally:
-            await agent.cleanup_mcp()
+        sem = asyncio.Semaphore(4)
 
+        async def bounded(prompt):
+            async with sem:
+                return await agent.chat_async(prompt, use_mcp=True)
 
+        async def run_serial():
+            return [await agent.chat_async(task_prompt, use_mcp=True) for task_prompt in prompts]
 
-@pytest.mark.asyncio
-async def test_mcp_agent_async():
-    """测试异步MCP Agent功能（函数形式）"""
-    test_instance = TestAgentMCP()
-    await test_instance.test_mcp_agent_async()
-
+        try:
+            start_time = time.perf_counter()
+            results = await asyncio.wait_for(
+                _run_concurrently([bounded(p) for p in prompts]),
+                timeout=_TIMED_SECTION_TIMEOUT
+            )
+            parallel_time = time.perf_counter() - start_time
 
-@pytest.mark.asyncio
-async def test_mixed_agent_async():
-    """测试异步混合Agent功能（函数形式）"""
-    test_instance = TestAgentMCP()
-    await test_instance.test_mixed_agent_async()
+            # 对比串行执行时间（同一组提示词）
+            start_time = time.perf_counter()
+            await asyncio.wait_for(run_serial(), timeout=_TIMED_SECTION_TIMEOUT)
+            serial_time = time.perf_counter() - start_time
+        except Exception as e:
+            pytest.fail(f"并行测试失败: {e}")
 
+        # 断言放在 try 之外，失败时保留原始的断言信息
+        for result in results:
+            assert result['success'] == True, result['final_response']
+            assert len(result['tool_calls']) > 0
 
-@pytest.mark.asyncio
-async def test_parallel_agent_calls():
-    """测试Agent并行调用（函数形式）"""
-    test_instance = TestAgentMCP()
-    await test_instance.test_parallel_agent_calls()
+        # 耗时写入测试报告（junit xml），便于在 CI 上追踪回归
+        speedup = serial_time / parallel_time
+        record_property("parallel_seconds", parallel_time)
+        record_property("serial_seconds", serial_time)
+        record_property("speedup", speedup)
+        # 理想加速比为 min(任务数, 并发上限)，LLM 延迟波动较大，只要求超过下限
+        assert speedup > _MIN_PARALLEL_SPEEDUP, (
+            f"并行加速比 {speedup:.2f}x 未超过 {_MIN_PARALLEL_SPEEDUP}x"
+            f"（理想值 {min(len(prompts), 4)}x）"
+        )
 
 
-async def main():
-    """主测试函数"""
-    print("开始测试Agent的MCP功能")
-    print("=" * 60)
-    
-    # 创建测试实例
-    test_instance = TestAgentMCP()
-    
-    
-    # 测试异步MCP Agent
-    await test_instance.test_mcp_agent_async()
-    
-    print("\n" + "=" * 60)
-    
-    # 测试异步混合Agent
-    await test_instance.test_mixed_agent_async()
-    
-    print("\n" + "=" * 60)
-    
-    # 测试并行调用
-    await test_instance.test_parallel_agent_calls()
-    
-    print("\n" + "=" * 60)
-    print("Agent MCP功能测试完成！")
+@pytest.mark.parametrize("method", [
+    "test_mcp_agent_async",
+    "test_mixed_agent_async",
+    "test_parallel_agent_calls",
+])
+@pytest.mark.asyncio(loop_scope="module")
+async def test_agent_mcp_entry(method, agent, record_property):
+    """按方法名调用 TestAgentMCP 中的测试（函数形式）"""
+    await getattr(TestAgentMCP(), method)(agent, record_property)
 
 
 if __name__ == "__main__":
-    # 运行测试
-    asyncio.run(main())
+    # 脚本方式运行时交给 pytest 调度，复用模块级 fixture（MCP 服务器只启动一次）
+    raise SystemExit(pytest.main([__file__, "--import-mode=importlib", "-s"]))
@@ -1,55 +1,132 @@
+import asyncio
 from pydantic import BaseModel
 import pytest
-from ..llm import LLM
+import pytest_asyncio
 from ..template_parser.template_parser import TemplateParser, MyModel
 from ..template_parser.table_parser import TableModel, TableParser
+from ..tool_call import LLMToolCaller
 
-def test_model_call():
-    llm = LLM()
-    answer = llm.call("你是谁")
+# 本模块的 LLM 调用由 llm_results 一次性并发发出，放在同一个 xdist worker 上（scripts/pytest.sh 使用 --dist loadgroup）
+pytestmark = pytest.mark.xdist_group("test_llm")
+
+
+class ExtraRowModel(BaseModel):
+    index: int
+    module: str
+    requirement: str
+    owner: str
+    priority: int
+
+
+class ExtraTableModel(BaseModel):
+    rows: list[ExtraRowModel]
+
+
+# 解析器在模块导入时构建一次，各测试直接复用
+TEMPLATE_PARSER = TemplateParser(
+    "姓名={name:str}，年龄={age:int}，模型={model:json:MyModel}，激活={active:bool}",
+    model_map={"MyModel": MyModel}
+)
+TABLE_PARSER = TableParser(TableModel, value_only=True)
+EXTRA_TABLE_PARSER = TableParser(ExtraTableModel, value_only=True)
+
+
+def add(a: float, b: float) -> float:
+    return a + b
+
+
+def echo(text: str) -> str:
+    return text
+
+
+def multiply(a: float, b: float) -> float:
+    return a * b
+
+
+@pytest.fixture(scope="module")
+def math_caller():
+    """工具签名解析和模板构建只做一次"""
+    return LLMToolCaller([add, echo, multiply])
+
+
+@pytest.fixture(scope="module")
+def echo_caller():
+    return LLMToolCaller([echo])
+
+
+def _llm_calls(math_caller, echo_caller):
+    """各测试对应的 (提示词, call_async 关键字参数)，键为测试名去掉 test_ 前缀"""
+    return {
+        "model_call": ("你是谁", {}),
+        "structured_output": ("请输出一个用户信息示例", {"parser": TEMPLATE_PARSER}),
+        "table_output": ("请输出10行以上的表格内容。", {"parser": TABLE_PARSER}),
+        "table_output_with_extra_fields": (
+            "请输出一个需求表格，包含序号、模块、需求点、负责人和优先级。", {"parser": EXTRA_TABLE_PARSER}
+        ),
+        "table_output_empty": ("请输出一个空表格。", {"parser": TABLE_PARSER}),
+        "tool_call_add": ("请帮我计算 3 加 5", {"caller": math_caller}),
+        "tool_call_echo": ("请使用工具输出：你好", {"caller": echo_caller}),
+    }
+
+
+# 与共用的 session 级 llm 使用同一个事件循环，避免异步客户端跨循环复用
+@pytest_asyncio.fixture(scope="module", loop_scope="session")
+async def llm_results(request, llm, math_caller, echo_caller):
+    """本次运行选中的测试（-k 过滤后）所需的 LLM 调用用 asyncio.gather 一次性并发发出，按调用名返回结果"""
+    calls = _llm_calls(math_caller, echo_caller)
+    names = [
+        name for name in dict.fromkeys(
+            item.originalname.removeprefix("test_") for item in request.session.items
+            if getattr(item, "module", None) is request.module
+        )
+        if name in calls
+    ]
+    # 单个调用出错只影响对应的测试，由 _result 重新抛出
+    results = await asyncio.gather(
+        *(llm.call_async(calls[name][0], **calls[name][1]) for name in names),
+        return_exceptions=True
+    )
+    return dict(zip(names, results))
+
+
+def _result(llm_results, name):
+    result = llm_results[name]
+    if isinstance(result, BaseException):
+        raise result
+    return result
+
+
+def test_model_call(llm_results):
+    answer = _result(llm_results, "model_call")
     assert isinstance(answer, str) or isinstance(answer, dict)
     assert answer  # 非空
 
-def test_structured_output():
-    llm = LLM()
-    template = "姓名={name:str}，年龄={age:int}，模型={model:json:MyModel}，激活={active:bool}"
-    parser = TemplateParser(template, model_map={"MyModel": MyModel})
-    result = llm.call("请输出一个用户信息示例", parser=parser)
+def test_structured_output(llm_results):
+    result = _result(llm_results, "structured_output")
     assert isinstance(result, dict)
     assert result.get("success", True)
     assert "name" in result.get("data", {})
     assert "age" in result.get("data", {})
 
-def test_table_output():
-    llm = LLM()
-    table_parser = TableParser(TableModel, value_only=True)
-    result = llm.call("请输出10行以上的表格内容。", parser=table_parser)
+def test_table_output(llm_results):
+    table_parser = TABLE_PARSER
+    result = _result(llm_results, "table_output")
     assert isinstance(result, dict)
     assert result.get("success", True)
     assert "table" in result.get("data", {})
     rows = result["data"]["table"]["rows"]
     assert isinstance(rows, list)
-    # 测试格式化输出
-    assert table_parser.to_tsv(rows)
-    assert table_parser.to_csv(rows)
-    assert table_parser.to_markdown(rows)
-    assert table_parser.to_json(rows)
+    # 测试格式化输出：一次遍历生成全部格式
+    formats = table_parser.to_formats(rows)
+    assert formats["tsv"]
+    assert formats["csv"]
+    assert formats["markdown"]
+    assert formats["json"]
 
 
-def test_table_output_with_extra_fields():
-    llm = LLM()
+def test_table_output_with_extra_fields(llm_results):
     # 表格包含额外字段
-    class ExtraRowModel(BaseModel):
-        index: int
-        module: str
-        requirement: str
-        owner: str
-        priority: int
-    class ExtraTableModel(BaseModel):
-        rows: list[ExtraRowModel]
-    table_parser = TableParser(ExtraTableModel, value_only=True)
-    prompt = "请输出一个需求表格，包含序号、模块、需求点、负责人和优先级。"
-    result = llm.call(prompt, parser=table_parser)
+    result = _result(llm_results, "table_output_with_extra_fields")
     assert isinstance(result, dict)
     assert result.get("success", True)
     rows = result["data"]["table"]["rows"]
@@ -58,10 +135,8 @@ def test_table_output_with_extra_fields():
         assert "owner" in row
         assert "priority" in row
 
-def test_table_output_empty():
-    llm = LLM()
-    table_parser = TableParser(TableModel, value_only=True)
-    result = llm.call("请输出一个空表格。", parser=table_parser)
+def test_table_output_empty(llm_results):
+    result = _result(llm_results, "table_output_empty")
     assert isinstance(result, dict)
     assert result.get("success", True)
     rows = result["data"]["table"]["rows"]
@@ -70,36 +145,14 @@ def test_table_output_empty():
     assert len(rows) == 0 or rows is not None
 
 
-def test_tool_call_add():
-    from ..llm import LLM
-    from ..tool_call import LLMToolCaller
-
-    def add(a: float, b: float) -> float:
-        return a + b
-
-    def echo(text: str) -> str:
-        return text
-
-    def multiply(a: float, b: float) -> float:
-        return a * b
-
-    caller = LLMToolCaller([add, echo, multiply])
-    llm = LLM()
-    result = llm.call("请帮我计算 3 加 5", caller=caller)
+def test_tool_call_add(llm_results):
+    result = _result(llm_results, "tool_call_add")
     assert isinstance(result, dict)
     assert result.get("tool_name") == "add"
     assert result.get("tool_result") == 8.0
 
-def test_tool_call_echo():
-    from ..llm import LLM
-    from ..tool_call import LLMToolCaller
-
-    def echo(text: str) -> str:
-        return text
-
-    caller = LLMToolCaller([echo])
-    llm = LLM()
-    result = llm.call("请使用工具输出：你好", caller=caller)
+def test_tool_call_echo(llm_results):
+    result = _result(llm_results, "tool_call_echo")
     assert isinstance(result, dict)
     assert result.get("tool_name") == "echo"
     assert "你好" in result.get("tool_result", "")
\ No newline at end of file
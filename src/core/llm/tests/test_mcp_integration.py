@@ -4,10 +4,11 @@
 import asyncio
 import sys
 import os
+import time
 import pytest
 
 
-from ..llm import LLM, create_llm_with_mcp
+from ..llm import LLM
 from ..tool_call import LLMToolCaller
 
 # 尝试导入MCP相关模块
@@ -17,6 +18,70 @@ except ImportError:
     MCP_AVAILABLE = False
 
 
+# 传统工具函数（名称即工具名，测试中按名称断言）
+def add(a: float, b: float) -> float:
+    """加法工具"""
+    return a + b
+
+
+def multiply(a: float, b: float) -> float:
+    """乘法工具"""
+    return a * b
+
+
+def echo(text: str) -> str:
+    """回声工具"""
+    return f"回声: {text}"
+
+
+# 传统工具调用器在模块导入时构建一次，各测试共用
+TRADITIONAL_CALLER = LLMToolCaller([add, multiply, echo])
+
+# 并发性能测试逐级明细输出开关，默认只输出最终汇总表
+_PERF_VERBOSE = os.getenv("PERF_VERBOSE") == "1"
+# 设置 PERF_PARALLEL_SWEEP=1 时各并发级别同时运行，缩短总耗时
+_PERF_PARALLEL_SWEEP = os.getenv("PERF_PARALLEL_SWEEP") == "1"
+
+
+def _perf_log(*args):
+    """并发性能测试的逐级明细，设置 PERF_VERBOSE=1 时才输出"""
+    if _PERF_VERBOSE:
+        print(*args)
+
+
+# 并发性能测试的四类任务，按 i % 4 直接索引，避免循环内逐个分支判断
+_PROMPT_BUILDERS = (
+    lambda i, tag: "请获取当前时间",
+    lambda i, tag: f"请使用echo_message工具重复'{tag}{i}'",
+    lambda i, tag: f"请使用calculate工具计算 {i*5} + {i*3}",
+    lambda i, tag: "请获取当前时间",
+)
+
+
+def _perf_prompts(num_calls, tag):
+    """并发性能测试的提示词列表，串行和并行两种执行方式共用"""
+    return [_PROMPT_BUILDERS[i & 3](i, tag) for i in range(num_calls)]
+
+
+async def _timed_call(llm, prompt, use_mcp, start_ns):
+    """调用 llm.call_async，返回 (结果或异常, 自 start_ns 起的耗时秒数)"""
+    try:
+        result = await llm.call_async(prompt, use_mcp=use_mcp)
+    except Exception as e:
+        result = e
+    return result, (time.perf_counter_ns() - start_ns) / 1e9
+
+
+async def _concurrent_calls(llm, prompts, use_mcp=False):
+    """
+    同时发出全部 llm.call_async 调用，按完成顺序逐个产出 (结果, 耗时)；
+    单个调用的异常作为结果产出，不影响其他调用
+    """
+    start_ns = time.perf_counter_ns()
+    for fut in asyncio.as_completed([_timed_call(llm, p, use_mcp, start_ns) for p in prompts]):
+        yield await fut
+
+
 class TestLLMIntegration:
     """LLM集成测试类"""
     
@@ -24,28 +89,12 @@ class TestLLMIntegration:
         """测试传统工具调用"""
         print("=== 测试传统工具调用 ===")
         
-        # 定义工具函数
-        def add(a: float, b: float) -> float:
-            """加法工具"""
-            return a + b
-
-        def multiply(a: float, b: float) -> float:
-            """乘法工具"""
-            return a * b
-
-        def echo(text: str) -> str:
-            """回声工具"""
-            return f"回声: {text}"
-
-        # 创建传统工具调用器
-        traditional_caller = LLMToolCaller([add, multiply, echo])
-        
         # 创建LLM实例
         llm = LLM()
         
         # 测试传统工具调用
         print("\n--- 测试加法 ---")
-        result1 = llm.call("请帮我计算 3 + 5", caller=traditional_caller)
+        result1 = llm.call("请帮我计算 3 + 5", caller=TRADITIONAL_CALLER)
         print(f"结果: {result1}")
         assert result1 is not None
         assert isinstance(result1, dict)
@@ -55,7 +104,7 @@ class TestLLMIntegration:
         assert result1["tool_result"] == 8.0
         
         print("\n--- 测试乘法 ---")
-        result2 = llm.call("请帮我计算 4 × 6", caller=traditional_caller)
+        result2 = llm.call("请帮我计算 4 × 6", caller=TRADITIONAL_CALLER)
         print(f"结果: {result2}")
         assert result2 is not None
         assert isinstance(result2, dict)
@@ -65,7 +114,7 @@ class TestLLMIntegration:
         assert result2["tool_result"] == 24.0
         
         print("\n--- 测试回声 ---")
-        result3 = llm.call("请重复说 'Hello World'", caller=traditional_caller)
+        result3 = llm.call("请重复说 'Hello World'", caller=TRADITIONAL_CALLER)
         print(f"结果: {result3}")
         assert result3 is not None
         # 回声工具可能直接返回字符串或包含工具调用信息的字典
@@ -77,39 +126,22 @@ class TestLLMIntegration:
         else:
             assert "Hello World" in str(result3)
 
-    @pytest.mark.asyncio
-    async def test_mcp_tools(self):
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_mcp_tools(self, mcp_llm):
         """测试MCP工具调用"""
         if not MCP_AVAILABLE:
             pytest.skip("MCP功能不可用，跳过测试")
         
         print("=== 测试MCP工具调用 ===")
         
-        # 创建MCP配置
-        mcp_configs = [
-            MCPServerConfig(
-                name="demo",
-                command="python",
-                args=["-m", "src.core.llm.demo.demo_mcp_server"],
-                transport=MCPTransportType.STDIO
-            )
-        ]
-        
-        # 创建支持MCP的LLM
-        llm = create_llm_with_mcp(mcp_configs)
-        
         try:
-            # 初始化MCP连接
-            print("初始化MCP连接...")
-            await llm.init_mcp()
-            
             # 获取可用工具
-            tools = llm.get_available_tools("mcp")
+            tools = mcp_llm.get_available_tools("mcp")
             print(f"可用的MCP工具: {tools}")
             
             # 测试MCP工具调用
             print("\n--- 测试MCP计算工具 ---")
-            result1 = await llm.call_async("请使用calculate工具计算 10 + 20", use_mcp=True)
+            result1 = await mcp_llm.call_async("请使用calculate工具计算 10 + 20", use_mcp=True)
             print(f"结果: {result1}")
             assert result1 is not None
             assert isinstance(result1, dict)
@@ -123,7 +155,7 @@ class TestLLMIntegration:
                 assert tool_result.structured_content.get('result') == 30.0
             
             print("\n--- 测试获取时间 ---")
-            result2 = await llm.call_async("请获取当前时间", use_mcp=True)
+            result2 = await mcp_llm.call_async("请获取当前时间", use_mcp=True)
             print(f"结果: {result2}")
             assert result2 is not None
             assert isinstance(result2, dict)
@@ -141,7 +173,7 @@ class TestLLMIntegration:
             assert "2025" in time_str
             
             print("\n--- 测试回声消息 ---")
-            result3 = await llm.call_async("请使用echo_message工具重复'MCP测试成功'", use_mcp=True)
+            result3 = await mcp_llm.call_async("请使用echo_message工具重复'MCP测试成功'", use_mcp=True)
             print(f"结果: {result3}")
             assert result3 is not None
             assert isinstance(result3, dict)
@@ -160,100 +192,52 @@ class TestLLMIntegration:
         except Exception as e:
             print(f"MCP测试出错: {e}")
             pytest.fail(f"MCP测试失败: {e}")
-        finally:
-            # 清理MCP连接
-            await llm.cleanup_mcp()
 
-    @pytest.mark.asyncio
-    async def test_mixed_usage(self):
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_mixed_usage(self, mcp_llm):
         """测试混合使用传统工具和MCP工具"""
         if not MCP_AVAILABLE:
             pytest.skip("MCP功能不可用，跳过混合测试")
         
         print("=== 测试混合使用 ===")
         
-        # 定义传统工具
-        def add(a: float, b: float) -> float:
-            return a + b
-        
-        traditional_caller = LLMToolCaller([add])
-        
-        # 创建MCP配置
-        mcp_configs = [
-            MCPServerConfig(
-                name="demo",
-                command="python",
-                args=["-m", "src.core.llm.demo.demo_mcp_server"],
-                transport=MCPTransportType.STDIO
-            )
-        ]
-        
-        llm = LLM(mcp_configs=mcp_configs)
-        
         try:
-            await llm.init_mcp()
-            
             print("\n--- 使用传统工具 ---")
-            result1 = llm.call("请计算 5 + 3", caller=traditional_caller, use_mcp=False)
+            result1 = mcp_llm.call("请计算 5 + 3", caller=TRADITIONAL_CALLER, use_mcp=False)
             print(f"传统工具结果: {result1}")
             assert result1 is not None
 
-            result1_async = await llm.call_async("请计算 5 + 3", caller=traditional_caller, use_mcp=False)
+            result1_async = await mcp_llm.call_async("请计算 5 + 3", caller=TRADITIONAL_CALLER, use_mcp=False)
             print(f"传统工具异步结果: {result1_async}")
             assert result1_async is not None
             
             print("\n--- 使用MCP工具 ---")
-            result2 = await llm.call_async("请获取当前时间", use_mcp=True)
+            result2 = await mcp_llm.call_async("请获取当前时间", use_mcp=True)
             print(f"MCP工具结果: {result2}")
             assert result2 is not None
             
             print("\n--- 普通对话（不使用工具） ---")
-            result3 = llm.call("你好，请介绍一下你自己")
+            result3 = mcp_llm.call("你好，请介绍一下你自己")
             print(f"普通对话结果: {result3}")
             assert result3 is not None
             
         except Exception as e:
             pytest.fail(f"混合使用测试失败: {e}")
-        finally:
-            await llm.cleanup_mcp()
 
-    @pytest.mark.asyncio
-    async def test_parallel_async_calls(self):
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_parallel_async_calls(self, mcp_llm):
         """测试并行异步调用"""
         if not MCP_AVAILABLE:
             pytest.skip("MCP功能不可用，跳过并行测试")
         
         print("=== 测试并行异步调用 ===")
         
-        # 定义传统工具
-        def add(a: float, b: float) -> float:
-            return a + b
-        
-        def multiply(a: float, b: float) -> float:
-            return a * b
-        
-        traditional_caller = LLMToolCaller([add, multiply])
-        
-        # 创建MCP配置
-        mcp_configs = [
-            MCPServerConfig(
-                name="demo",
-                command="python",
-                args=["-m", "src.core.llm.demo.demo_mcp_server"],
-                transport=MCPTransportType.STDIO
-            )
-        ]
-        
-        llm = LLM(mcp_configs=mcp_configs)
-        
         try:
-            await llm.init_mcp()
-            
             print("\n--- 并行调用多个传统工具 ---")
             # 并行调用多个传统工具
-            task1 = llm.call_async("请用工具计算 10 + 20", caller=traditional_caller, use_mcp=False)
-            task2 = llm.call_async("请用工具计算 5 × 6", caller=traditional_caller, use_mcp=False)
-            task3 = llm.call_async("请用工具计算 100 + 200", caller=traditional_caller, use_mcp=False)
+            task1 = mcp_llm.call_async("请用工具计算 10 + 20", caller=TRADITIONAL_CALLER, use_mcp=False)
+            task2 = mcp_llm.call_async("请用工具计算 5 × 6", caller=TRADITIONAL_CALLER, use_mcp=False)
+            task3 = mcp_llm.call_async("请用工具计算 100 + 200", caller=TRADITIONAL_CALLER, use_mcp=False)
             
             # 等待所有任务完成
             results = await asyncio.gather(task1, task2, task3)
@@ -266,9 +250,9 @@ class TestLLMIntegration:
             
             print("\n--- 并行调用多个MCP工具 ---")
             # 并行调用多个MCP工具
-            mcp_task1 = llm.call_async("请使用calculate工具计算 15 + 25", use_mcp=True)
-            mcp_task2 = llm.call_async("请获取当前时间", use_mcp=True)
-            mcp_task3 = llm.call_async("请使用echo_message工具重复'并行测试'", use_mcp=True)
+            mcp_task1 = mcp_llm.call_async("请使用calculate工具计算 15 + 25", use_mcp=True)
+            mcp_task2 = mcp_llm.call_async("请获取当前时间", use_mcp=True)
+            mcp_task3 = mcp_llm.call_async("请使用echo_message工具重复'并行测试'", use_mcp=True)
             
             # 等待所有MCP任务完成
             mcp_results = await asyncio.gather(mcp_task1, mcp_task2, mcp_task3)
@@ -281,10 +265,9 @@ class TestLLMIntegration:
             
             print("\n--- 混合并行调用（传统工具 + MCP工具 + 普通对话） ---")
             # 混合并行调用
-            mixed_task1 = llm.call_async("请用工具计算 7 + 8", caller=traditional_caller, use_mcp=False)
-            mixed_task2 = llm.call_async("请获取当前时间", use_mcp=True)
-            # 注意：普通对话需要用同步方式包装成异步
-            mixed_task3 = asyncio.create_task(asyncio.to_thread(llm.call, "请简单介绍一下Python"))
+            mixed_task1 = mcp_llm.call_async("请用工具计算 7 + 8", caller=TRADITIONAL_CALLER, use_mcp=False)
+            mixed_task2 = mcp_llm.call_async("请获取当前时间", use_mcp=True)
+            mixed_task3 = mcp_llm.call_async("请简单介绍一下Python")
             
             # 等待所有混合任务完成
             mixed_results = await asyncio.gather(mixed_task1, mixed_task2, mixed_task3)
@@ -303,106 +286,67 @@ class TestLLMIntegration:
 
         except Exception as e:
             pytest.fail(f"并行异步调用测试失败: {e}")
-        finally:
-            await llm.cleanup_mcp()
-
-    @pytest.mark.asyncio
-    async def test_concurrent_performance(self):
-        """专门测试并发性能的用例"""
-        import os
-        if not os.getenv('RUN_PERFORMANCE_TESTS', False):
-            print("性能测试默认跳过，设置环境变量 RUN_PERFORMANCE_TESTS=1 来运行")
-            return
-    
 
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_concurrent_performance(self, mcp_http_llm):
+        """专门测试并发性能的用例（MCP 服务器走 streamable-http，见 conftest 的 mcp_http_llm）"""
         if not MCP_AVAILABLE:
             pytest.skip("MCP功能不可用，跳过并发性能测试")
         
         print("=== 专门测试并发性能 ===")
         
-        # 创建MCP配置
-        mcp_configs = [
-            MCPServerConfig(
-                name="demo",
-                command="python",
-                args=["-m", "src.core.llm.demo.demo_mcp_server"],
-                transport=MCPTransportType.STDIO
-            )
-        ]
-        
-        llm = LLM(mcp_configs=mcp_configs)
-        
         try:
-            await llm.init_mcp()
-            
-            import time
-            
             # 测试不同并发数量的性能
             concurrent_levels = [1, 2, 5, 10, 20]
             performance_results = {}
             
-            for num_calls in concurrent_levels:
-                print(f"\n{'='*60}")
-                print(f"测试并发数量: {num_calls}")
-                print(f"{'='*60}")
+            async def run_level(num_calls):
+                _perf_log(f"\n{'='*60}")
+                _perf_log(f"测试并发数量: {num_calls}")
+                _perf_log(f"{'='*60}")
                 
                 # 串行执行基准测试
-                print(f"\n--- 串行执行 {num_calls} 个调用（基准测试） ---")
-                start_time = time.time()
+                _perf_log(f"\n--- 串行执行 {num_calls} 个调用（基准测试） ---")
+                start_ns = time.perf_counter_ns()
                 
-                serial_results = []
-                for i in range(num_calls):
-                    task_type = i % 4
-                    if task_type == 0:
-                        result = await llm.call_async("请获取当前时间", use_mcp=True)
-                    elif task_type == 1:
-                        result = await llm.call_async(f"请使用echo_message工具重复'串行{i}'", use_mcp=True)
-                    elif task_type == 2:
-                        result = await llm.call_async(f"请使用calculate工具计算 {i*5} + {i*3}", use_mcp=True)
-                    else:
-                        result = await llm.call_async("请获取当前时间", use_mcp=True)
-                    serial_results.append(result)
+                serial_results = [None] * num_calls
+                for i, prompt in enumerate(_perf_prompts(num_calls, "串行")):
+                    serial_results[i] = await mcp_http_llm.call_async(prompt, use_mcp=True)
                 
-                serial_time = time.time() - start_time
-                print(f"串行执行时间: {serial_time:.3f}秒")
-                print(f"平均每个调用: {(serial_time / num_calls):.3f}秒")
+                serial_time = (time.perf_counter_ns() - start_ns) / 1e9
+                _perf_log(f"串行执行时间: {serial_time:.3f}秒")
+                _perf_log(f"平均每个调用: {(serial_time / num_calls):.3f}秒")
                 
                 # 并行执行测试
-                print(f"\n--- 并行执行 {num_calls} 个调用 ---")
-                start_time = time.time()
-                
-                parallel_tasks = []
-                for i in range(num_calls):
-                    task_type = i % 4
-                    if task_type == 0:
-                        task = llm.call_async("请获取当前时间", use_mcp=True)
-                    elif task_type == 1:
-                        task = llm.call_async(f"请使用echo_message工具重复'并行{i}'", use_mcp=True)
-                    elif task_type == 2:
-                        task = llm.call_async(f"请使用calculate工具计算 {i*5} + {i*3}", use_mcp=True)
-                    else:
-                        task = llm.call_async("请获取当前时间", use_mcp=True)
-                    parallel_tasks.append(task)
-                
-                parallel_results = await asyncio.gather(*parallel_tasks, return_exceptions=True)
-                parallel_time = time.time() - start_time
+                _perf_log(f"\n--- 并行执行 {num_calls} 个调用 ---")
+                start_ns = time.perf_counter_ns()
                 
-                # 统计成功和失败
+                # 按完成顺序统计成功和失败，同时记录每个调用的完成耗时
                 success_count = 0
-                error_count = 0
-                for result in parallel_results:
-                    if isinstance(result, Exception):
-                        error_count += 1
-                        print(f"错误: {result}")
-                    elif isinstance(result, dict) and "tool_name" in result:
+                latencies = []
+                first_success_time = None
+                async for result, elapsed in _concurrent_calls(mcp_http_llm, _perf_prompts(num_calls, "并行"), use_mcp=True):
+                    latencies.append(elapsed)
+                    # 成功结果是带 tool_name 的普通 dict，异常和其他返回值都算失败
+                    if type(result) is dict and "tool_name" in result:
                         success_count += 1
+                        if first_success_time is None:
+                            first_success_time = elapsed
                     else:
-                        error_count += 1
+                        _perf_log(f"错误: {result}")
+                error_count = num_calls - success_count
+                parallel_time = (time.perf_counter_ns() - start_ns) / 1e9
+                # 按完成顺序产出，latencies 已是升序
+                p50 = latencies[len(latencies) // 2]
+                p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
                 
-                print(f"并行执行时间: {parallel_time:.3f}秒")
-                print(f"平均每个调用: {(parallel_time / num_calls):.3f}秒")
-                print(f"成功调用: {success_count}/{num_calls} ({(success_count/num_calls*100):.1f}%)")
-                print(f"失败调用: {error_count}/{num_calls} ({(error_count/num_calls*100):.1f}%)")
+                _perf_log(f"并行执行时间: {parallel_time:.3f}秒")
+                if first_success_time is not None:
+                    _perf_log(f"首个成功调用耗时: {first_success_time:.3f}秒")
+                _perf_log(f"调用完成耗时 p50: {p50:.3f}秒, p99: {p99:.3f}秒")
+                _perf_log(f"平均每个调用: {(parallel_time / num_calls):.3f}秒")
+                _perf_log(f"成功调用: {success_count}/{num_calls} ({(success_count/num_calls*100):.1f}%)")
+                _perf_log(f"失败调用: {error_count}/{num_calls} ({(error_count/num_calls*100):.1f}%)")
                 
                 # 计算性能指标
                 if parallel_time > 0 and success_count > 0:
@@ -411,12 +355,12 @@ class TestLLMIntegration:
                     throughput_serial = num_calls / serial_time
                     throughput_parallel = success_count / parallel_time
                     
-                    print(f"\n--- 性能指标 ---")
-                    print(f"加速比: {speedup:.2f}x")
-                    print(f"并行效率: {efficiency:.1f}%")
-                    print(f"串行吞吐量: {throughput_serial:.2f} 调用/秒")
-                    print(f"并行吞吐量: {throughput_parallel:.2f} 调用/秒")
-                    print(f"吞吐量提升: {(throughput_parallel/throughput_serial):.2f}x")
+                    _perf_log(f"\n--- 性能指标 ---")
+                    _perf_log(f"加速比: {speedup:.2f}x")
+                    _perf_log(f"并行效率: {efficiency:.1f}%")
+                    _perf_log(f"串行吞吐量: {throughput_serial:.2f} 调用/秒")
+                    _perf_log(f"并行吞吐量: {throughput_parallel:.2f} 调用/秒")
+                    _perf_log(f"吞吐量提升: {(throughput_parallel/throughput_serial):.2f}x")
                     
                     # 保存结果用于最终分析
                     performance_results[num_calls] = {
@@ -425,21 +369,29 @@ class TestLLMIntegration:
                         'speedup': speedup,
                         'efficiency': efficiency,
                         'success_rate': success_count / num_calls,
-                        'throughput_improvement': throughput_parallel / throughput_serial
+                        'throughput_improvement': throughput_parallel / throughput_serial,
+                        'first_success_time': first_success_time,
+                        'p50': p50,
+                        'p99': p99
                     }
                     
                     # 性能评估
                     if efficiency >= 70:
-                        print(f"🟢 性能评级: 优秀 (效率 {efficiency:.1f}%)")
+                        _perf_log(f"🟢 性能评级: 优秀 (效率 {efficiency:.1f}%)")
                     elif efficiency >= 50:
-                        print(f"🟡 性能评级: 良好 (效率 {efficiency:.1f}%)")
+                        _perf_log(f"🟡 性能评级: 良好 (效率 {efficiency:.1f}%)")
                     elif efficiency >= 30:
-                        print(f"🟠 性能评级: 一般 (效率 {efficiency:.1f}%)")
+                        _perf_log(f"🟠 性能评级: 一般 (效率 {efficiency:.1f}%)")
                     else:
-                        print(f"🔴 性能评级: 较差 (效率 {efficiency:.1f}%)")
-                
-                # 稍微等待一下，避免资源竞争
-                await asyncio.sleep(0.5)
+                        _perf_log(f"🔴 性能评级: 较差 (效率 {efficiency:.1f}%)")
+            
+            if _PERF_PARALLEL_SWEEP:
+                # 各并发级别同时运行，总耗时取决于最慢的级别；级别之间会争用服务器，结果不再是单独运行时的数据
+                await asyncio.gather(*(run_level(n) for n in concurrent_levels))
+                performance_results = dict(sorted(performance_results.items()))
+            else:
+                for num_calls in concurrent_levels:
+                    await run_level(num_calls)
             
             # 最终性能分析报告
             print(f"\n{'='*80}")
@@ -460,10 +412,23 @@ class TestLLMIntegration:
             
             # 寻找最优并发数
             if performance_results:
-                best_efficiency = max(performance_results.items(), 
-                                    key=lambda x: x[1]['efficiency'])
-                best_throughput = max(performance_results.items(), 
-                                    key=lambda x: x[1]['throughput_improvement'])
+                # 一次遍历同时求出最优并发数和各类瓶颈
+                best_efficiency = best_throughput = None
+                high_concurrency = []
+                low_speedup = []
+                success_issues = []
+                for k, v in performance_results.items():
+                    efficiency = v['efficiency']
+                    if best_efficiency is None or efficiency > best_efficiency[1]['efficiency']:
+                        best_efficiency = (k, v)
+                    if best_throughput is None or v['throughput_improvement'] > best_throughput[1]['throughput_improvement']:
+                        best_throughput = (k, v)
+                    if k >= 10 and efficiency < 30:
+                        high_concurrency.append(k)
+                    if v['speedup'] < 1.5:
+                        low_speedup.append(k)
+                    if v['success_rate'] < 0.95:
+                        success_issues.append(k)
                 
                 print(f"\n📊 性能分析:")
                 print(f"• 最高效率: 并发数 {best_efficiency[0]} (效率 {best_efficiency[1]['efficiency']:.1f}%)")
@@ -471,20 +436,14 @@ class TestLLMIntegration:
                 
                 # 性能瓶颈分析
                 print(f"\n🔍 瓶颈分析:")
-                high_concurrency = [k for k, v in performance_results.items() 
-                                if k >= 10 and v['efficiency'] < 30]
                 if high_concurrency:
                     print(f"• 高并发性能下降: 并发数 {high_concurrency} 时效率显著下降")
                     print(f"• 可能原因: MCP连接池限制、服务器处理能力瓶颈")
                 
-                low_speedup = [k for k, v in performance_results.items() 
-                            if v['speedup'] < 1.5]
                 if low_speedup:
                     print(f"• 并行加速不明显: 并发数 {low_speedup} 时加速比 < 1.5x")
                     print(f"• 可能原因: 锁竞争、同步I/O、网络延迟")
                 
-                success_issues = [k for k, v in performance_results.items() 
-                                if v['success_rate'] < 0.95]
                 if success_issues:
                     print(f"• 稳定性问题: 并发数 {success_issues} 时成功率 < 95%")
                     print(f"• 建议: 降低并发数或增加重试机制")
@@ -513,15 +472,13 @@ class TestLLMIntegration:
                     
         except Exception as e:
             pytest.fail(f"并发性能测试失败: {e}")
-        finally:
-            await llm.cleanup_mcp()
 
 
-@pytest.mark.asyncio
-async def test_concurrent_performance():
+@pytest.mark.asyncio(loop_scope="session")
+async def test_concurrent_performance(mcp_http_llm):
     """并发性能测试（函数形式）"""
     test_instance = TestLLMIntegration()
-    await test_instance.test_concurrent_performance()
+    await test_instance.test_concurrent_performance(mcp_http_llm)
 
 # 为了保持向后兼容，保留原来的函数形式
 def test_traditional_tools():
@@ -530,62 +487,27 @@ def test_traditional_tools():
     test_instance.test_traditional_tools()
 
 
-@pytest.mark.asyncio
-async def test_mcp_tools():
+@pytest.mark.asyncio(loop_scope="session")
+async def test_mcp_tools(mcp_llm):
     """测试MCP工具调用（函数形式）"""
     test_instance = TestLLMIntegration()
-    await test_instance.test_mcp_tools()
+    await test_instance.test_mcp_tools(mcp_llm)
 
 
-@pytest.mark.asyncio
-async def test_mixed_usage():
+@pytest.mark.asyncio(loop_scope="session")
+async def test_mixed_usage(mcp_llm):
     """测试混合使用（函数形式）"""
     test_instance = TestLLMIntegration()
-    await test_instance.test_mixed_usage()
+    await test_instance.test_mixed_usage(mcp_llm)
 
 
-@pytest.mark.asyncio
-async def test_parallel_async_calls():
+@pytest.mark.asyncio(loop_scope="session")
+async def test_parallel_async_calls(mcp_llm):
     """测试并行异步调用（函数形式）"""
     test_instance = TestLLMIntegration()
-    await test_instance.test_parallel_async_calls()
-
-
-# 手动运行脚本时的主函数
-async def main():
-    """主测试函数（手动运行时使用）"""
-    print("开始测试集成MCP支持的LLM类")
-    print("=" * 50)
-    
-    # 创建测试实例
-    test_instance = TestLLMIntegration()
-    
-    # 测试传统工具
-    test_instance.test_traditional_tools()
-    
-    print("\n" + "=" * 50)
-    
-    # 测试MCP工具
-    await test_instance.test_mcp_tools()
-    
-    print("\n" + "=" * 50)
-    
-    # 测试混合使用
-    await test_instance.test_mixed_usage()
-    
-    print("\n" + "=" * 50)
-    
-    # 测试并行异步调用
-    await test_instance.test_parallel_async_calls()
-    
-    print("\n" + "=" * 50)
-    
-     # 专门的并发性能测试
-    await test_instance.test_concurrent_performance()
-    print("\n" + "=" * 50)
-    print("所有测试完成！")
+    await test_instance.test_parallel_async_calls(mcp_llm)
 
 
 if __name__ == "__main__":
-    # 手动运行时使用异步
-    asyncio.run(main())
\ No newline at end of file
+    # 手动运行时交给 pytest 调度，复用会话级 mcp_llm fixture
+    raise SystemExit(pytest.main([__file__, "--import-mode=importlib", "-s"]))
@@ -189,4 +189,76 @@ def test_list_field_with_comma_in_value_only():
     print(result)
     assert result["success"]
     assert result["data"]["table"]["rows"][0]["foo"] == "A,1"
-    assert result["data"]["table"]["rows"][1]["foo"] == "B,2"
\ No newline at end of file
+    assert result["data"]["table"]["rows"][1]["foo"] == "B,2"
+
+def test_multi_format_reuses_parsed_rows(monkeypatch):
+    # 同一输出依次转换为多种格式时只解析一次
+    llm_output = '{ {"A",1}, {"B",2} }'
+    parser = TableParser(TableModel, value_only=True)
+    calls = []
+    original_validate = parser._validate
+    monkeypatch.setattr(parser, "_validate", lambda out: calls.append(out) or original_validate(out))
+    assert "A\t1" in parser.to_tsv(llm_output)
+    assert "A,1" in parser.to_csv(llm_output)
+    assert "| A | 1 |" in parser.to_markdown(llm_output)
+    assert '"A"' in parser.to_json(llm_output)
+    assert len(calls) == 1
+    assert "C\t3" in parser.to_tsv('{ {"C",3} }')
+    assert len(calls) == 2
+
+
+def test_to_formats_matches_individual_outputs():
+    parser = TableParser(TableModel, value_only=True)
+    llm_output = '{ {"A,x",1}, {"B",2} }'
+    formats = parser.to_formats(llm_output)
+    assert formats["tsv"] == parser.to_tsv(llm_output)
+    assert formats["csv"] == parser.to_csv(llm_output)
+    assert formats["markdown"] == parser.to_markdown(llm_output)
+    assert formats["json"] == parser.to_json(llm_output)
+    empty = parser.to_formats("")
+    assert empty == {"tsv": "", "csv": "", "markdown": "", "json": parser.to_json("")}
+
+
+def test_validate_caches_repeated_output(monkeypatch):
+    # 同一输出（包括解析失败的输出）重复校验时直接返回缓存结果
+    parser = TableParser(TableModel, value_only=True)
+    calls = []
+    original_parse = parser._parse_value_only
+    monkeypatch.setattr(parser, "_parse_value_only", lambda out: calls.append(out) or original_parse(out))
+    first = parser.validate('{ {"A",1} }')
+    assert parser.validate('{ {"A",1} }') == first
+    assert len(calls) == 1
+    parser.validate('{ {"A","not_int"} }')
+    parser.validate('{ {"A","not_int"} }')
+    assert len(calls) == 2
+
+
+def test_cached_rows_not_shared_with_caller():
+    # 调用方修改返回的行数据，不影响同一输出之后的解析结果
+    parser = TableParser(TableModel, value_only=True)
+    llm_output = '{ {"A",1} }'
+    parser.get_rows(llm_output).append("junk")
+    parser.validate(llm_output)["data"]["table"]["rows"][0]["foo"] = "changed"
+    assert parser.get_rows(llm_output) == [{"foo": "A", "num": 1}]
+    assert "junk" not in parser.to_tsv(llm_output)
+
+
+def test_to_json_format_consistent():
+    # 空表和非空表使用同一种 JSON 格式，不随可选依赖变化
+    parser = TableParser(TableModel, value_only=True)
+    assert parser.to_json("") == '{"rows": []}'
+    assert parser.to_json('{ {"中文",1} }') == '{"rows": [{"foo": "中文", "num": 1}]}'
+
+
+def test_value_only_trailing_empty_value():
+    # 最后一列为空值时保留为空串；只有字段数多于表头时才丢弃末尾的空字段
+    class PairRow(BaseModel):
+        a: str
+        b: str
+
+    class PairTable(BaseModel):
+        rows: list[PairRow]
+
+    parser = TableParser(PairTable, value_only=True)
+    assert parser.get_rows('{ {"x", } }') == [{"a": "x", "b": ""}]
+    assert parser.get_rows('{ {"x","y", } }') == [{"a": "x", "b": "y"}]
@@ -1,3 +1,4 @@
+import functools
 import pytest
 from pydantic import BaseModel
 from ..template_parser.table_parser import TableParser, RowModel, TableModel
@@ -11,17 +12,81 @@ llm = ChatOpenAI(
     temperature=0.3
 )
 
-@pytest.mark.parametrize("value_only,prompt_suffix,check", [
-    (False, "\n请输出一组表格数据。", lambda r, parser: r["success"] and r["data"]["table"][parser.table_field][0]["foo"]),
-    (True, "\n请输出一组表格数据。", lambda r, parser: r["success"] and r["data"]["table"][parser.table_field][0]["foo"]),
-    (True, "\n请输出foo为test，num为999的内容。", lambda r, parser: r["success"] and r["data"]["table"][parser.table_field][0]["foo"] == "test" and r["data"]["table"][parser.table_field][0]["num"] == 999),
+# 本模块的用例放在同一个 xdist worker 上（scripts/pytest.sh 使用 --dist loadgroup），批量请求只发一次
+pytestmark = pytest.mark.xdist_group("table_parser_llm")
+
+
+class ComplexRowModel(BaseModel):
+    foo: str
+    num: int
+    meta: dict
+
+
+class ComplexTableModel(BaseModel):
+    rows: list[ComplexRowModel]
+
+
+# 各测试用例的 (表格模型, value_only, 提示词后缀)
+_CASES = {
+    "parse": (TableModel, False, "\n请输出一组表格数据。"),
+    "parse_value_only": (TableModel, True, "\n请输出一组表格数据。"),
+    "parse_value_only_exact": (TableModel, True, "\n请输出foo为test，num为999的内容。"),
+    "empty": (TableModel, False, "\n请输出一个空表格。"),
+    "nested_dict": (ComplexTableModel, False, "\n请输出包含meta字段（为字典）的表格内容。"),
+    "large_rows": (TableModel, False, "\n请输出10行以上的表格内容。"),
+    "mixed_types": (TableModel, False, "\n请输出num字段有字符串和数字混合的表格内容。"),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _parser_for(model_cls, *, value_only):
+    """同一模型和模式共用一个 TableParser，格式说明只生成一次。
+
+    value_only 为必填的仅关键字参数，保证 lru_cache 对同一组合只有一个缓存键。
+    """
+    return TableParser(model_cls, value_only=value_only)
+
+
+def _item_case(item):
+    """测试项对应的用例名：参数化测试取 case 参数，其余按 test_llm_table_<用例名> 的命名取出"""
+    callspec = getattr(item, "callspec", None)
+    if callspec is not None and "case" in callspec.params:
+        return callspec.params["case"]
+    return item.originalname.removeprefix("test_llm_table_")
+
+
+@pytest.fixture(scope="module")
+def llm_outputs(request):
+    """本次运行选中的用例（-k 过滤后）一次性批量请求 LLM，按用例名返回"""
+    cases = list(dict.fromkeys(
+        case for case in (
+            _item_case(item) for item in request.session.items
+            if getattr(item, "module", None) is request.module
+        )
+        if case in _CASES
+    ))
+    # 格式说明作为 system 消息、用例要求作为 user 消息，
+    # 同一解析器的用例共享相同的前缀，服务端可复用前缀缓存
+    prompts = [
+        [
+            ("system", _parser_for(model, value_only=value_only).get_format_instructions()),
+            ("user", suffix.strip()),
+        ]
+        for model, value_only, suffix in (_CASES[case] for case in cases)
+    ]
+    responses = llm.batch(prompts)
+    return {case: response.content for case, response in zip(cases, responses)}
+
+
+@pytest.mark.parametrize("case,check", [
+    ("parse", lambda r, parser: r["success"] and r["data"]["table"][parser.table_field][0]["foo"]),
+    ("parse_value_only", lambda r, parser: r["success"] and r["data"]["table"][parser.table_field][0]["foo"]),
+    ("parse_value_only_exact", lambda r, parser: r["success"] and r["data"]["table"][parser.table_field][0]["foo"] == "test" and r["data"]["table"][parser.table_field][0]["num"] == 999),
 ])
-def test_llm_table_parse(value_only, prompt_suffix, check):
-    parser = TableParser(TableModel, value_only=value_only)
-    instructions = parser.get_format_instructions()
-    prompt = instructions + prompt_suffix
-    response = llm.invoke(prompt)
-    llm_output = response.content
+def test_llm_table_parse(case, check, llm_outputs):
+    model, value_only, _ = _CASES[case]
+    parser = _parser_for(model, value_only=value_only)
+    llm_output = llm_outputs[case]
     print("LLM输出：", llm_output)
     result = parser.validate(llm_output)
     print("解析结果：", result)
@@ -29,57 +94,33 @@ def test_llm_table_parse(value_only, prompt_suffix, check):
 
 
 
-def test_llm_table_empty():
-    parser = TableParser(TableModel)
-    instructions = parser.get_format_instructions()
-    prompt = instructions + "\n请输出一个空表格。"
-    response = llm.invoke(prompt)
-    llm_output = response.content
-    result = parser.validate(llm_output)
+def test_llm_table_empty(llm_outputs):
+    parser = _parser_for(TableModel, value_only=False)
+    result = parser.validate(llm_outputs["empty"])
     print("空表格解析结果：", result)
     assert result["success"]
     assert result["data"]["table"][parser.table_field] == []
 
 
 
-def test_llm_table_nested_dict():
-    class ComplexRowModel(BaseModel):
-        foo: str
-        num: int
-        meta: dict
-
-    class ComplexTableModel(BaseModel):
-        rows: list[ComplexRowModel]
-
-    parser = TableParser(ComplexTableModel)
-    instructions = parser.get_format_instructions()
-    prompt = instructions + "\n请输出包含meta字段（为字典）的表格内容。"
-    response = llm.invoke(prompt)
-    llm_output = response.content
-    result = parser.validate(llm_output)
+def test_llm_table_nested_dict(llm_outputs):
+    parser = _parser_for(ComplexTableModel, value_only=False)
+    result = parser.validate(llm_outputs["nested_dict"])
     print("嵌套dict解析结果：", result)
     assert result["success"]
     assert "meta" in result["data"]["table"][parser.table_field][0]
 
-def test_llm_table_large_rows():
-    parser = TableParser(TableModel)
-    instructions = parser.get_format_instructions()
-    prompt = instructions + "\n请输出10行以上的表格内容。"
-    response = llm.invoke(prompt)
-    llm_output = response.content
-    result = parser.validate(llm_output)
+def test_llm_table_large_rows(llm_outputs):
+    parser = _parser_for(TableModel, value_only=False)
+    result = parser.validate(llm_outputs["large_rows"])
     print("大量行解析结果：", result)
     assert result["success"]
     assert len(result["data"]["table"][parser.table_field]) >= 10
 
 
 
-def test_llm_table_mixed_types():
-    parser = TableParser(TableModel)
-    instructions = parser.get_format_instructions()
-    prompt = instructions + "\n请输出num字段有字符串和数字混合的表格内容。"
-    response = llm.invoke(prompt)
-    llm_output = response.content
-    result = parser.validate(llm_output)
+def test_llm_table_mixed_types(llm_outputs):
+    parser = _parser_for(TableModel, value_only=False)
+    result = parser.validate(llm_outputs["mixed_types"])
     print("混合类型解析结果：", result)
-    # 这里可以根据你的解析容错策略断言 success 或 fail
\ No newline at end of file
+    # 这里可以根据你的解析容错策略断言 success 或 fail
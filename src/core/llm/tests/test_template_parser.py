@@ -359,4 +359,134 @@ def test_json_field_with_nested_object_and_comma():
     result = parser.validate(llm_output)
     assert result["success"]
     assert result["data"]["data"]["foo"]["bar"] == "baz, qux"
-    assert result["data"]["data"]["num"] == 3
\ No newline at end of file
+    assert result["data"]["data"]["num"] == 3
+
+
+def test_json_field_with_brace_in_string_value():
+    class ModelWithBrace(BaseModel):
+        foo: str
+        num: int
+    template = "数据={data:json:ModelWithBrace}。"
+    llm_output = '数据={"foo": "a}b", "num": 4}。'
+    parser = TemplateParser(template, model_map={"ModelWithBrace": ModelWithBrace})
+    result = parser.validate(llm_output)
+    assert result["success"]
+    assert result["data"]["data"]["foo"] == "a}b"
+    assert result["data"]["data"]["num"] == 4
+
+
+def test_json_model_non_strict():
+    class ModelWithInt(BaseModel):
+        foo: str
+        num: int
+    template = "数据={data:json:ModelWithInt}。"
+    llm_output = '数据={"foo": "A", "num": "5"}。'
+    strict_parser = TemplateParser(template, model_map={"ModelWithInt": ModelWithInt})
+    assert not strict_parser.validate(llm_output)["success"]
+    # 非严格模式只做 pydantic 校验，"5" 可转换为 int
+    parser = TemplateParser(template, model_map={"ModelWithInt": ModelWithInt}, strict=False)
+    result = parser.validate(llm_output)
+    assert result["success"]
+    assert result["data"]["data"]["num"] == 5
+    assert not parser.validate('数据={"foo": "A", "num": "x"}。')["success"]
+
+def test_list_python_literal():
+    template = "标签={tags:list[str]}。"
+    parser = TemplateParser(template)
+    result = parser.validate("标签=['A', 'B']。")
+    assert result["success"]
+    assert result["data"]["tags"] == ["A", "B"]
+
+def test_memoize_repeated_output(monkeypatch):
+    template = "姓名={name:str}，年龄={age:int}。"
+    parser = TemplateParser(template, memoize=True)
+    calls = []
+    original_parse = parser.strict_parse_llm_output
+    monkeypatch.setattr(parser, "strict_parse_llm_output", lambda out, **kw: calls.append(out) or original_parse(out, **kw))
+    first = parser.validate("姓名=张三，年龄=18。")
+    assert first["success"]
+    assert parser.validate("姓名=张三，年龄=18。") == first
+    # 返回的是副本：修改上一次的结果不影响缓存
+    first["data"]["name"] = "changed"
+    assert parser.validate("姓名=张三，年龄=18。")["data"]["name"] == "张三"
+    assert len(calls) == 1
+    assert parser.validate("姓名=李四，年龄=20。")["data"]["name"] == "李四"
+    assert len(calls) == 2
+
+def test_skip_candidates_with_missing_segments(monkeypatch):
+    template = "姓名={name:str}，年龄={age:int}。"
+    parser = TemplateParser(template)
+    calls = []
+    original_parse = parser.strict_parse_llm_output
+    monkeypatch.setattr(parser, "strict_parse_llm_output", lambda out, **kw: calls.append(out) or original_parse(out, **kw))
+    result = parser.validate("姓名=张三。姓名=李四。姓名=王五。")
+    assert not result["success"]
+    # 分割符不全时不再逐个候选解析，只解析最后一个候选得到错误信息
+    assert calls == ["姓名=王五。"]
+    assert result["matched_output"] == "姓名=王五。"
+    assert "年龄=" in result["data"]
+
+def test_validate_many_matches_validate():
+    template = "姓名={name:str}，年龄={age:int}。"
+    parser = TemplateParser(template)
+    outputs = [f"姓名=用户{i}，年龄={i}。" for i in range(80)] + ["姓名=张三，年龄=abc。"]
+    expected = [parser.validate(out) for out in outputs]
+    assert parser.validate_many(outputs, workers=2) == expected
+    assert parser.validate_many(outputs[:3]) == expected[:3]
+
+def test_long_python_literal_json_field():
+    template = "数据={data:dict}。"
+    items = ", ".join(f"'k{i}': {{'v': '值{i}'}}" for i in range(50))
+    parser = TemplateParser(template)
+    result = parser.validate("数据={" + items + "}。")
+    assert result["success"]
+    assert result["data"]["data"]["k49"] == {"v": "值49"}
+
+def test_precompile_shares_parser_state():
+    template = "编号={id:int}，备注={note:str}。"
+    TemplateParser.precompile([template])
+    first = TemplateParser(template)
+    second = TemplateParser(template)
+    assert first.DynamicModel is second.DynamicModel
+    assert second.validate("编号=7，备注=无。")["data"] == {"id": 7, "note": "无"}
+
+def test_combined_pattern_matches_field_parsing():
+    template = "姓名={name:str}，备注={note:str}。"
+    parser = TemplateParser(template)
+    assert parser._combined_re is not None
+    for note in ["无", "长" * 200]:
+        result = parser.validate(f"姓名= 张三 ，备注={note}。多余。")
+        assert result["success"]
+        assert result["data"] == {"name": "张三", "note": note}
+    assert TemplateParser("数据={data:json}。")._combined_re is None
+
+def test_locate_template_segment():
+    parser = TemplateParser("姓名={name:str}。")
+    assert parser.locate_template_segment("姓名=张三。") == "姓名=张三。"
+    assert parser.locate_template_segment("前言 姓名=张三。后记") == "姓名=张三。"
+    with pytest.raises(ValueError):
+        parser.locate_template_segment("姓名=张三")
+
+
+def test_strict_parse_coerces_bool_by_default():
+    # 直接调用 strict_parse_llm_output 时 bool 字段仍转换为 True/False，validate 内部用 coerce=False
+    parser = TemplateParser("开关={flag:bool}，备注={note:str}。")
+    assert parser.strict_parse_llm_output("开关=true，备注=无。") == {"flag": True, "note": "无"}
+    assert parser.strict_parse_llm_output("开关=0，备注=无。") == {"flag": False, "note": "无"}
+    assert parser.strict_parse_llm_output("开关=0，备注=无。", coerce=False) == {"flag": "0", "note": "无"}
+    assert parser.validate("开关=0，备注=无。")["data"] == {"flag": False, "note": "无"}
+    # 逐字段解析的路径同样转换
+    parser = TemplateParser("备注={note:str}，开关={flag:bool}")
+    assert parser.strict_parse_llm_output("备注=无，开关=True") == {"note": "无", "flag": True}
+
+
+def test_shared_parser_state_is_read_only():
+    # 同一模板的实例共享 fields/segments，不能被某个实例原地修改
+    first = TemplateParser("编号={id:int}，备注={note:str}。")
+    second = TemplateParser("编号={id:int}，备注={note:str}。")
+    assert first.fields is second.fields
+    with pytest.raises(TypeError):
+        first.fields["extra"] = (str, ...)
+    with pytest.raises(TypeError):
+        first.segments[0] = "x"
+    assert list(second.fields) == ["id", "note"]
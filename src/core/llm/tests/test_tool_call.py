@@ -50,4 +50,40 @@ def test_llm_tool_caller_args_as_str():
     llm_output = '{"tool_call": {"name": "add", "args": "{\\"a\\": 2, \\"b\\": 3}"}}'
     name, result = caller.call(llm_output)
     assert name == "add"
-    assert result == 5
\ No newline at end of file
+    assert result == 5
+
+def test_infer_param_model_cached():
+    def foo(a: int, b: str = "x"): pass
+    assert infer_param_model(foo) is infer_param_model(foo)
+
+def test_llm_tool_caller_shares_state_per_tool_set():
+    def add(a: int, b: int): return a + b
+    # 同一组工具共用解析器和格式说明
+    assert LLMToolCaller([add]).parser is LLMToolCaller([add]).parser
+    # 默认值 1 与 1.0 相等但不是同一组工具，不共用（格式说明中的默认值不同）
+    def scale(x: float, k: float = 1): return x * k
+    first = LLMToolCaller([scale])
+    def scale(x: float, k: float = 1.0): return x * k
+    assert LLMToolCaller([scale]).parser is not first.parser
+
+def test_llm_tool_caller_json_fast_path():
+    def add(a: int, b: int): return a + b
+    caller = LLMToolCaller([add])
+    # 整段 JSON 直接解码，不经过模板解析
+    llm_output = '  {"tool_call": {"name": "add", "args": {"a": 2, "b": 3}}}\n'
+    assert caller._parse_json_call(llm_output) == {"name": "add", "args": {"a": 2, "b": 3}}
+    assert caller.call(llm_output) == ("add", 5)
+    # 前后带说明文字时不走快速路径，仍由模板解析兜底
+    llm_output = '好的，调用工具：{"tool_call": {"name": "add", "args": {"a": 1, "b": 1}}}'
+    assert caller._parse_json_call(llm_output) is None
+    assert caller.call(llm_output) == ("add", 2)
+
+def test_llm_tool_caller_regex_path():
+    def add(a: int, b: int): return a + b
+    caller = LLMToolCaller([add])
+    llm_output = '好的，调用工具：\n{"tool_call": {"name": "add", "args": {"a": 1, "b": 1}}}\n以上。'
+    assert caller._match_tool_call(llm_output) == {"name": "add", "args": {"a": 1, "b": 1}}
+    assert caller.call(llm_output) == ("add", 2)
+    # <think> 中的示例不参与匹配
+    llm_output = '<think>{"tool_call": {"name": "add", "args": {"a": 9, "b": 9}}}</think>直接回答'
+    assert caller._match_tool_call(llm_output) is None
@@ -1,16 +1,30 @@
+import functools
 import inspect
 import json
+import re
 from openai import OpenAI
 from src.ENV import llm_url, llm_api_key, llm_default_model
-from src.core.llm.template_parser.template_parser import TemplateParser
+from src.core.llm.template_parser.template_parser import TemplateParser, LRUCache, json_loads, strip_think_tags
 from pydantic import BaseModel, create_model
 
 tool_registry = {}
 
 def infer_param_model(func):
     """
-    根据函数签名自动生成pydantic参数模型
+    根据函数签名自动生成pydantic参数模型；同一函数只生成一次
     """
+    try:
+        hash(func)
+    except TypeError:
+        # 不可哈希的可调用对象无法作为缓存键，直接生成
+        return _build_param_model(func)
+    return _cached_param_model(func)
+
+@functools.lru_cache(maxsize=None)
+def _cached_param_model(func):
+    return _build_param_model(func)
+
+def _build_param_model(func):
     sig = inspect.signature(func)
     fields = {}
     for name, param in sig.parameters.items():
@@ -71,6 +85,21 @@ def build_tool_template(tool_names, param_models):
     return template, example
 
 
+# tool_call 模板的形状固定，预编译一次，在通用模板解析之前先尝试直接匹配
+_TOOL_CALL_RE = re.compile(
+    r'\{\s*"tool_call"\s*:\s*\{\s*"name"\s*:\s*(?P<name>"[^"]*"|[^,}]+)\s*,'
+    r'\s*"args"\s*:\s*(?P<args>\{.*\}|"(?:[^"\\]|\\.)*")\s*\}\s*\}',
+    re.DOTALL,
+)
+
+
+# 工具集 -> (template, example, model_map, parser, instructions)
+# 键为按顺序排列的 (工具名, 参数模型)，参数模型由 infer_param_model 按函数缓存，
+# 同一组工具重复构造 LLMToolCaller 时共用同一个解析器和格式说明
+_CALLER_CACHE_SIZE = 256
+_caller_cache = LRUCache(_CALLER_CACHE_SIZE)
+
+
 class LLMToolCaller:
     def __init__(self, tools):
         """
@@ -82,23 +111,75 @@ class LLMToolCaller:
             param_model = infer_param_model(func)
             self.tool_registry[tool_name] = {"func": func, "param_model": param_model}
         self.param_models = {name: info["param_model"] for name, info in self.tool_registry.items()}
-        self.template, self.example = build_tool_template(list(self.param_models.keys()), self.param_models)
-        self.model_map = {model.__name__: model for model in self.param_models.values()}
-        self.parser = TemplateParser(self.template, model_map=self.model_map)
-        self.instructions = (
+        # 工具顺序决定格式说明中的示例顺序，键保留顺序
+        key = tuple(self.param_models.items())
+        state = _caller_cache.get(key)
+        if state is None:
+            state = self._build_state(self.param_models)
+            _caller_cache.put(key, state)
+        self.template, self.example, self.model_map, self.parser, self.instructions = state
+
+    @staticmethod
+    def _build_state(param_models):
+        template, example = build_tool_template(list(param_models.keys()), param_models)
+        model_map = {model.__name__: model for model in param_models.values()}
+        parser = TemplateParser(template, model_map=model_map)
+        instructions = (
             "\n\n[以下是工具调用格式的说明（可根据情况忽略）]\n"
             + "注意：如果没有任何一个工具能满足你的需求，请直接按原来的要求回复原始内容，不要调用 tool_call, 忽略以下内容，不要在回答中提到工具这件事。\n"
             + "注意：一次只允许调用一个工具，如果回答中包含了多个工具调用，只会执行第一个\n"
-            + self.parser.get_format_instructions()
-            + "\n不同工具的args示例：\n" + self.example
+            + parser.get_format_instructions()
+            + "\n不同工具的args示例：\n" + example
         )
+        return template, example, model_map, parser, instructions
+
+    @staticmethod
+    def _parse_json_call(llm_output):
+        """
+        输出整体就是 tool_call JSON 时直接解码，跳过模板解析；
+        不是合法 JSON 或结构不符时返回 None，交给 TemplateParser 兜底
+        """
+        stripped = llm_output.strip()
+        if not (stripped.startswith("{") and stripped.endswith("}")):
+            return None
+        try:
+            obj = json_loads(stripped)
+        except ValueError:
+            return None
+        tool_call = obj.get("tool_call") if isinstance(obj, dict) else None
+        if not isinstance(tool_call, dict) or "name" not in tool_call:
+            return None
+        return tool_call
+
+    @staticmethod
+    def _match_tool_call(llm_output):
+        """
+        用预编译正则从夹杂说明文字的输出中提取 tool_call，
+        匹配不到或 args 不是合法 JSON 时返回 None，交给 TemplateParser 兜底
+        """
+        m = _TOOL_CALL_RE.search(strip_think_tags(llm_output))
+        if m is None:
+            return None
+        name = m.group("name").strip()
+        try:
+            # 带引号的工具名按 JSON 字符串解码，与整段 JSON 解码的结果一致
+            if name.startswith('"'):
+                name = json_loads(name)
+            args = json_loads(m.group("args"))
+        except ValueError:
+            return None
+        return {"name": name, "args": args}
 
     def call(self, llm_output):
         try:
-            parsed = self.parser.validate(llm_output)
-            if not parsed.get('success', False):
-                return None, None
-            data = parsed["data"]
+            data = self._parse_json_call(llm_output)
+            if data is None:
+                data = self._match_tool_call(llm_output)
+            if data is None:
+                parsed = self.parser.validate(llm_output)
+                if not parsed.get('success', False):
+                    return None, None
+                data = parsed["data"]
             tool_name = data.get("name")
             if isinstance(tool_name, str) and tool_name.startswith('"') and tool_name.endswith('"'):
                 tool_name = tool_name[1:-1]